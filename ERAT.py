@@ -1,364 +1,176 @@
 import sys
-import os
-import re
-import matplotlib
-import pandas as pd
-import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout,
                              QHBoxLayout, QFileDialog, QWidget, QTableWidget, QTableWidgetItem,
-                             QMessageBox, QTabWidget, QComboBox, QProgressBar, QTextEdit)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import datetime
+                             QMessageBox, QTabWidget, QComboBox, QProgressBar, QTextEdit,
+                             QTableView, QLineEdit, QInputDialog, QCheckBox)
+from PyQt5.QtCore import (Qt, QThread, QTimer, QSettings, pyqtSignal, QAbstractTableModel, QModelIndex,
+                          QSortFilterProxyModel)
+from PyQt5.QtGui import QFont, QBrush
+import threading
+
+# 数据模型与解析逻辑位于 erat_core（不依赖 Qt/matplotlib），此处重新导出以兼容 from ERAT import ...
+from erat_core import (CACHE_DIR, Student, Experiment, SubmissionMatrix, Class, Course, DirectoryParser,
+                       StudentManager, Logger, StatisticsExporter, REPORT_FORMATS)
+
+
+
+SIZE_SAMPLE_ROWS = 200  # 自动调整列宽时最多参考的行数
+STATS_DEBOUNCE_MS = 80  # 切换课程/班级后等待多久再刷新统计
+CHRONIC_TOP_N = 50  # 汇总统计中列出的缺交最多的学生人数
+WATCH_INTERVAL_MS = 500  # 实时监视时多久把收集到的目录变化应用一次
+
+
+def format_rate(rate):
+    return f"{rate:.2f}%"
+
+
+def rate_brush(rate):
+    # 根据提交率设置不同的颜色
+    if rate < 60:
+        return QBrush(Qt.red)
+    elif rate < 80:
+        return QBrush(Qt.yellow)
+    return QBrush(Qt.green)
+
+
+class StatsTableModel(QAbstractTableModel):
+    # 直接以统计结果（字典列表）为数据源，单元格文本在视图绘制时才生成
+    def __init__(self, columns, background=None, parent=None):
+        # columns: [(表头, 字段名, 显示格式函数或 None)]；background: {字段名: 值 -> QBrush}
+        super().__init__(parent)
+        self.columns = columns
+        self.background = background or {}
+        self.rows = []
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        _, key, formatter = self.columns[index.column()]
+        value = self.rows[index.row()][key]
+        if role == Qt.DisplayRole:
+            return formatter(value) if formatter else str(value)
+        if role == Qt.UserRole:
+            return value  # 排序使用原始值，数值列按大小而不是按文本排序
+        if role == Qt.BackgroundRole and key in self.background:
+            return self.background[key](value)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return super().headerData(section, orientation, role)
+
+
+class StatsTableView(QWidget):
+    # 过滤输入框 + 可排序表格
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(model)
+        self.proxy.setSortRole(Qt.UserRole)
+        self.proxy.setFilterKeyColumn(-1)  # 在所有列中查找
+        self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("筛选...")
+        self.filter_edit.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(-1, Qt.AscendingOrder)  # 初始保持原顺序
+        self.table.horizontalHeader().setResizeContentsPrecision(SIZE_SAMPLE_ROWS)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.filter_edit)
+        layout.addWidget(self.table)
+
+    def set_rows(self, rows):
+        self.model.set_rows(rows)
+        self.table.resizeColumnsToContents()
 
 
-# 清理字体缓存配置
-matplotlib._cache_dir = None  # 禁用缓存
+class BackgroundWorker(QThread):
+    progress = pyqtSignal(int, int, str)  # 已完成数, 总数, 说明
+    completed = pyqtSignal(bool)
 
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Zen Hei']  # Windows常用字体
-plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cancel_event = threading.Event()
 
-class Student:
-    def __init__(self, student_id, name, grade="", class_name=""):
-        self.student_id = student_id
-        self.name = name
-        self.grade = grade  # 新增年级属性
-        self.class_name = class_name  # 新增班级属性
-        self.missing_experiments = []
-
-    def add_missing_experiment(self, experiment_name):
-        self.missing_experiments.append(experiment_name)
-
-
-class Experiment:
-    def __init__(self, name):
-        self.name = name
-        self.submitted_students = set()
-
-    def add_submitted_student(self, student_id):
-        self.submitted_students.add(student_id)
-
-    def get_missing_students(self, all_students):
-        all_ids = {student.student_id for student in all_students}
-        return all_ids - self.submitted_students
-
-    def get_submission_rate(self, total_students):
-        if total_students == 0:
-            return 0
-        return len(self.submitted_students) / total_students * 100
-
-
-class Class:
-    def __init__(self, name):
-        self.name = name
-        self.experiments = {}  # 实验名 -> Experiment对象
-
-    def add_experiment(self, experiment_name):
-        if experiment_name not in self.experiments:
-            self.experiments[experiment_name] = Experiment(experiment_name)
-        return self.experiments[experiment_name]
-
-    def get_experiment(self, experiment_name):
-        return self.experiments.get(experiment_name)
-
-
-class Course:
-    def __init__(self, name):
-        self.name = name
-        self.classes = {}  # 班级名 -> Class对象
-
-    def add_class(self, class_name):
-        if class_name not in self.classes:
-            self.classes[class_name] = Class(class_name)
-        return self.classes[class_name]
-
-    def get_class(self, class_name):
-        return self.classes.get(class_name)
-
-
-class DirectoryParser:
-    def __init__(self, student_manager):
-        self.student_manager = student_manager
-        self.courses = {}  # 课程名 -> Course对象
-        self.logger = Logger()
-
-    def parse_directory(self, root_path):
-        self.courses = {}
-        if not os.path.exists(root_path):
-            self.logger.log(f"错误：目录不存在 - {root_path}")
-            return False
-
-        # 遍历目录结构
-        for course_name in os.listdir(root_path):
-            course_path = os.path.join(root_path, course_name)
-            if not os.path.isdir(course_path):
-                continue
-
-            course = self.add_course(course_name)
-
-            for class_name in os.listdir(course_path):
-                class_path = os.path.join(course_path, class_name)
-                if not os.path.isdir(class_path):
-                    continue
-
-                class_obj = course.add_class(class_name)
-
-                for experiment_name in os.listdir(class_path):
-                    experiment_path = os.path.join(class_path, experiment_name)
-                    if not os.path.isdir(experiment_path):
-                        continue
-
-                    experiment = class_obj.add_experiment(experiment_name)
-
-                    # 解析实验目录中的文件
-                    self._parse_experiment_files(experiment_path, course_name, class_name, experiment)
-
-        self._update_missing_experiments()
-        return True
-
-    def add_course(self, course_name):
-        if course_name not in self.courses:
-            self.courses[course_name] = Course(course_name)
-        return self.courses[course_name]
-
-    def _parse_experiment_files(self, experiment_path, course_name, class_name, experiment):
-        file_pattern = re.compile(r'实验(\d+)_(\d+)-(\w+)\.(doc|docx|pdf|txt)')
-
-        for filename in os.listdir(experiment_path):
-            file_path = os.path.join(experiment_path, filename)
-            if not os.path.isfile(file_path):
-                continue
-
-            match = file_pattern.match(filename)
-            if not match:
-                self.logger.log(f"文件名格式错误: {filename}")
-                continue
-
-            experiment_num = match.group(1)
-            student_id = match.group(2)
-            student_name = match.group(3)
-
-            # 验证学生是否存在
-            student = self.student_manager.get_student(student_id)
-            if not student:
-                self.logger.log(f"学生不在名单中: {student_name}({student_id})")
-                continue
-
-            # 检查学生姓名是否匹配
-            if student.name != student_name:
-                self.logger.log(f"学生姓名不匹配: 文件中为{student_name}，名单中为{student.name}({student_id})")
-
-            experiment.add_submitted_student(student_id)
-
-    def _update_missing_experiments(self):
-        # 遍历所有课程-班级-实验，更新学生的缺交实验
-        for course_name, course in self.courses.items():
-            for class_name, class_obj in course.classes.items():
-                for experiment_name, experiment in class_obj.experiments.items():
-                    missing_students = experiment.get_missing_students(
-                        self.student_manager.get_students_by_class(class_name))
-
-                    for student_id in missing_students:
-                        student = self.student_manager.get_student(student_id)
-                        if student:
-                            student.add_missing_experiment(experiment_name)
-
-    def get_course_names(self):
-        return list(self.courses.keys())
-
-    def get_class_names(self, course_name):
-        course = self.courses.get(course_name)
-        if course:
-            return list(course.classes.keys())
-        return []
-
-    def get_student_stats(self, course_name, class_name):
-        course = self.courses.get(course_name)
-        if not course:
-            return []
-
-        class_obj = course.get_class(class_name)
-        if not class_obj:
-            return []
-
-        students = self.student_manager.get_students_by_class(class_name)
-        stats = []
-
-        for student in students:
-            missing_count = len(student.missing_experiments)
-            missing_list = ", ".join(student.missing_experiments)
-            stats.append({
-                'student_id': student.student_id,
-                'name': student.name,
-                'grade': student.grade,  # 新增年级
-                'class_name': student.class_name,  # 新增班级
-                'missing_count': missing_count,
-                'missing_list': missing_list
-            })
-
-        return stats
-
-    def get_experiment_stats(self, course_name, class_name):
-        course = self.courses.get(course_name)
-        if not course:
-            return []
-
-        class_obj = course.get_class(class_name)
-        if not class_obj:
-            return []
-
-        total_students = len(self.student_manager.get_students_by_class(class_name))
-        stats = []
-
-        for experiment_name, experiment in class_obj.experiments.items():
-            missing_students = experiment.get_missing_students(
-                self.student_manager.get_students_by_class(class_name))
-            missing_names = []
-
-            for student_id in missing_students:
-                student = self.student_manager.get_student(student_id)
-                if student:
-                    missing_names.append(f"{student.name}({student_id})")
-
-            submission_rate = experiment.get_submission_rate(total_students)
-
-            stats.append({
-                'experiment_name': experiment_name,
-                'submission_rate': submission_rate,
-                'missing_students': ", ".join(missing_names)
-            })
-
-        return stats
-
-    def get_submission_rates(self, course_name, class_name):
-        course = self.courses.get(course_name)
-        if not course:
-            return [], []
-
-        class_obj = course.get_class(class_name)
-        if not class_obj:
-            return [], []
-
-        experiments = sorted(class_obj.experiments.values(),
-                             key=lambda exp: int(re.search(r'\d+', exp.name).group()) if re.search(r'\d+',
-                                                                                                   exp.name) else 0)
-
-        names = [exp.name for exp in experiments]
-        rates = [exp.get_submission_rate(len(self.student_manager.get_students_by_class(class_name)))
-                 for exp in experiments]
-
-        return names, rates
-
-
-class StudentManager:
-    def __init__(self):
-        self.students = {}  # 学号 -> Student对象
-        self.classes = {}  # 班级名 -> [Student对象]
-        self.logger = Logger()
-
-    def add_student(self, student_id, name, grade="", class_name=""):
-        if student_id in self.students:
-            self.logger.log(f"警告：重复添加学生 {name}({student_id})")
-            return
-
-        student = Student(student_id, name, grade, class_name)  # 传递年级和班级
-        self.students[student_id] = student
-
-        if class_name:
-            if class_name not in self.classes:
-                self.classes[class_name] = []
-            self.classes[class_name].append(student)
-
-    def import_from_excel(self, file_path):
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
         try:
-            df = pd.read_excel(file_path)
-            # 假设Excel包含学号、姓名、年级和班级四列
-            for index, row in df.iterrows():
-                student_id = str(row.get('学号', '')).strip()
-                name = str(row.get('姓名', '')).strip()
-                grade = str(row.get('年级', '')).strip()  # 新增年级解析
-                class_name = str(row.get('班级', '')).strip()
-
-                if student_id and name:
-                    self.add_student(student_id, name, grade, class_name)
-
-            self.logger.log(f"成功从Excel导入 {len(df)} 名学生")
-            return True
+            success = self.work()
         except Exception as e:
-            self.logger.log(f"导入Excel失败: {str(e)}")
-            return False
-
-    def get_student(self, student_id):
-        return self.students.get(student_id)
-
-    def get_students_by_class(self, class_name):
-        return self.classes.get(class_name, [])
-
-    def get_all_students(self):
-        return list(self.students.values())
-
-    def clear_students(self):
-        self.students = {}
-        self.classes = {}
-
+            Logger().error(f"后台任务失败: {str(e)}")
+            success = False
+        self.completed.emit(success)
 
-class Logger:
-    _instance = None
+    def work(self):
+        raise NotImplementedError
 
-    def __new__(cls):
-        if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance.logs = []
-        return cls._instance
 
-    def log(self, message):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        full_message = f"[{timestamp}] {message}"
-        self._instance.logs.append(full_message)
-        print(full_message)  # 同时输出到控制台
-
-    def get_logs(self):
-        return self._instance.logs
+class ImportWorker(BackgroundWorker):
+    def __init__(self, student_manager, file_path, parent=None):
+        super().__init__(parent)
+        self.student_manager = student_manager
+        self.file_path = file_path
 
-    def clear_logs(self):
-        self._instance.logs = []
+    def work(self):
+        return self.student_manager.import_from_excel(
+            self.file_path,
+            progress_callback=lambda done, total: self.progress.emit(done, total, "正在导入学生名单"),
+            cancel_event=self.cancel_event)
 
 
-class StatisticsExporter:
-    @staticmethod
-    def export_student_stats_to_excel(student_stats, file_path):
-        if not student_stats:
-            return False
+class ParseWorker(BackgroundWorker):
+    course_parsed = pyqtSignal(str)
 
-        # 导出包含年级和班级的学生统计数据
-        df = pd.DataFrame(student_stats)
-        try:
-            df.to_excel(file_path, index=False)
-            return True
-        except Exception as e:
-            Logger().log(f"导出学生统计数据失败: {str(e)}")
-            return False
+    def __init__(self, directory_parser, root_path, parent=None):
+        super().__init__(parent)
+        self.directory_parser = directory_parser
+        self.root_path = root_path
 
-    @staticmethod
-    def export_experiment_stats_to_excel(experiment_stats, file_path):
-        if not experiment_stats:
-            return False
+    def work(self):
+        return self.directory_parser.parse_directory(
+            self.root_path,
+            progress_callback=lambda done, total, name: self.progress.emit(done, total, f"正在解析 {name}"),
+            course_callback=self.course_parsed.emit,
+            cancel_event=self.cancel_event)
 
-        df = pd.DataFrame(experiment_stats)
-        try:
-            df.to_excel(file_path, index=False)
-            return True
-        except Exception as e:
-            Logger().log(f"导出实验统计数据失败: {str(e)}")
-            return False
 
+class ExportWorker(BackgroundWorker):
+    def __init__(self, directory_parser, output_dir, file_format, parent=None):
+        super().__init__(parent)
+        self.directory_parser = directory_parser
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.files = []
 
-class Canvas(FigureCanvas):
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = plt.Figure(figsize=(width, height), dpi=dpi)
-        super().__init__(self.fig)
-        self.setParent(parent)
+    def work(self):
+        self.files = StatisticsExporter.export_term_report(
+            self.directory_parser, self.output_dir, self.file_format,
+            progress_callback=lambda done, total, name: self.progress.emit(done, total, f"正在导出 {name}"),
+            cancel_event=self.cancel_event)
+        return bool(self.files)
 
 
 class ERATMainWindow(QMainWindow):
@@ -366,10 +178,16 @@ class ERATMainWindow(QMainWindow):
         super().__init__()
 
         self.student_manager = StudentManager()
-        self.directory_parser = DirectoryParser(self.student_manager)
+        self.directory_parser = DirectoryParser(self.student_manager, cache_dir=CACHE_DIR)
         self.logger = Logger()
+        self.worker = None  # 当前运行的后台任务
+        self.watcher = None  # 实时监视实验目录的 DirectoryWatcher
+        self.log_sequence = 0  # 日志标签页已显示到的日志序号
+        self.roster_restored = False  # 当前名单是否从本地数据库恢复，重新导入名单时应整体替换
+        self.settings = QSettings("ERAT", "ERAT")
 
         self.init_ui()
+        self.load_last_session()
 
     def init_ui(self):
         self.setWindowTitle("实验报告统计分析工具 (ERAT)")
@@ -398,6 +216,26 @@ class ERATMainWindow(QMainWindow):
         self.refresh_btn.clicked.connect(self.refresh_statistics)
         control_layout.addWidget(self.refresh_btn)
 
+        # 导出学期报表按钮
+        self.export_term_btn = QPushButton("导出学期报表")
+        self.export_term_btn.clicked.connect(self.export_term_report)
+        control_layout.addWidget(self.export_term_btn)
+
+        # 实时监视复选框：开启后目录中的文件增删会自动反映到统计中
+        self.watch_check = QCheckBox("实时监视")
+        self.watch_check.toggled.connect(self.on_watch_toggled)
+        control_layout.addWidget(self.watch_check)
+
+        # 保存会话复选框：关闭后不再读写本地数据库，下次启动也不恢复
+        self.store_check = QCheckBox("保存会话")
+        self.store_check.setChecked(self.settings.value("use_store", True, type=bool))
+        self.store_check.toggled.connect(self.on_store_toggled)
+        control_layout.addWidget(self.store_check)
+
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setInterval(WATCH_INTERVAL_MS)
+        self.watch_timer.timeout.connect(self.apply_watch_changes)
+
         # 添加到主布局
         main_layout.addLayout(control_layout)
 
@@ -411,15 +249,28 @@ class ERATMainWindow(QMainWindow):
 
         self.class_combo = QComboBox()
         self.class_combo.currentTextChanged.connect(self.on_class_changed)
+
+        self.stats_timer = QTimer(self)
+        self.stats_timer.setSingleShot(True)
+        self.stats_timer.setInterval(STATS_DEBOUNCE_MS)
+        self.stats_timer.timeout.connect(self.show_current_stats)
         selection_layout.addWidget(QLabel("选择班级:"))
         selection_layout.addWidget(self.class_combo)
 
         main_layout.addLayout(selection_layout)
 
         # 创建进度条
+        progress_layout = QHBoxLayout()
         self.progress_bar = QProgressBar()
         self.progress_bar.hide()
-        main_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.progress_bar)
+
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.clicked.connect(self.cancel_task)
+        self.cancel_btn.hide()
+        progress_layout.addWidget(self.cancel_btn)
+
+        main_layout.addLayout(progress_layout)
 
         # 创建标签页
         self.tab_widget = QTabWidget()
@@ -428,9 +279,14 @@ class ERATMainWindow(QMainWindow):
         self.student_tab = QWidget()
         student_layout = QVBoxLayout(self.student_tab)
 
-        self.student_table = QTableWidget()
-        self.student_table.setColumnCount(6)  # 修改为6列
-        self.student_table.setHorizontalHeaderLabels(["学号", "姓名", "年级", "班级", "缺交次数", "缺交实验列表"])  # 添加年级和班级列
+        self.student_table = StatsTableView(StatsTableModel([
+            ("学号", 'student_id', None),
+            ("姓名", 'name', None),
+            ("年级", 'grade', None),  # 添加年级列
+            ("班级", 'class_name', None),  # 添加班级列
+            ("缺交次数", 'missing_count', None),
+            ("缺交实验列表", 'missing_list', None),
+        ]))
         student_layout.addWidget(self.student_table)
 
         self.export_student_btn = QPushButton("导出学生统计")
@@ -443,9 +299,11 @@ class ERATMainWindow(QMainWindow):
         self.experiment_tab = QWidget()
         experiment_layout = QVBoxLayout(self.experiment_tab)
 
-        self.experiment_table = QTableWidget()
-        self.experiment_table.setColumnCount(3)
-        self.experiment_table.setHorizontalHeaderLabels(["实验名称", "提交率", "未提交学生"])
+        self.experiment_table = StatsTableView(StatsTableModel([
+            ("实验名称", 'experiment_name', None),
+            ("提交率", 'submission_rate', format_rate),
+            ("未提交学生", 'missing_students', None),
+        ], background={'submission_rate': rate_brush}))
         experiment_layout.addWidget(self.experiment_table)
 
         self.export_experiment_btn = QPushButton("导出实验统计")
@@ -455,28 +313,110 @@ class ERATMainWindow(QMainWindow):
         self.tab_widget.addTab(self.experiment_tab, "实验统计")
 
         # 可视化标签页
+        # 图表在第一次切换到该标签页时才创建，启动时不加载 matplotlib
         self.visualization_tab = QWidget()
-        visualization_layout = QVBoxLayout(self.visualization_tab)
-
-        self.canvas = Canvas(self.visualization_tab, width=7, height=4)
-        visualization_layout.addWidget(self.canvas)
+        QVBoxLayout(self.visualization_tab)
+        self.canvas = None
+        self.chart_pending = True  # 图表是否需要按当前选择重绘
 
         self.tab_widget.addTab(self.visualization_tab, "提交率可视化")
 
+        # 汇总统计标签页：所有课程/班级的汇总，切换到该页时才计算
+        self.summary_tab = QWidget()
+        summary_layout = QVBoxLayout(self.summary_tab)
+        summary_tabs = QTabWidget()
+
+        self.course_summary_table = StatsTableView(StatsTableModel([
+            ("课程", 'course', None),
+            ("班级数", 'classes', None),
+            ("学生数", 'students', None),
+            ("实验数", 'experiments', None),
+            ("已提交", 'submitted', None),
+            ("应提交", 'expected', None),
+            ("提交率", 'submission_rate', format_rate),
+        ], background={'submission_rate': rate_brush}))
+        summary_tabs.addTab(self.course_summary_table, "按课程")
+
+        self.grade_summary_table = StatsTableView(StatsTableModel([
+            ("年级", 'grade', None),
+            ("学生数", 'students', None),
+            ("已提交", 'submitted', None),
+            ("应提交", 'expected', None),
+            ("提交率", 'submission_rate', format_rate),
+        ], background={'submission_rate': rate_brush}))
+        summary_tabs.addTab(self.grade_summary_table, "按年级")
+
+        self.experiment_summary_table = StatsTableView(StatsTableModel([
+            ("课程", 'course', None),
+            ("实验名称", 'experiment_name', None),
+            ("班级数", 'classes', None),
+            ("最低提交率", 'min_rate', format_rate),
+            ("中位提交率", 'median_rate', format_rate),
+            ("平均提交率", 'mean_rate', format_rate),
+            ("最高提交率", 'max_rate', format_rate),
+            ("各班提交率", 'class_rates', None),
+        ], background={'min_rate': rate_brush}))
+        summary_tabs.addTab(self.experiment_summary_table, "实验提交率分布")
+
+        self.chronic_table = StatsTableView(StatsTableModel([
+            ("学号", 'student_id', None),
+            ("姓名", 'name', None),
+            ("年级", 'grade', None),
+            ("班级", 'class_name', None),
+            ("缺交次数", 'missing_count', None),
+            ("应交次数", 'expected', None),
+            ("缺交率", 'missing_rate', format_rate),
+            ("缺交实验列表", 'missing_list', None),
+        ]))
+        summary_tabs.addTab(self.chronic_table, f"缺交最多的 {CHRONIC_TOP_N} 名学生")
+
+        summary_layout.addWidget(summary_tabs)
+        self.summary_dirty = False
+        self.tab_widget.addTab(self.summary_tab, "汇总统计")
+
+        # 解析诊断标签页：汇总表随解析结果更新，明细只在切换到该页时才生成文本
+        self.diagnostics_tab = QWidget()
+        diagnostics_layout = QVBoxLayout(self.diagnostics_tab)
+
+        self.diagnostics_table = QTableWidget()
+        self.diagnostics_table.setColumnCount(2)
+        self.diagnostics_table.setHorizontalHeaderLabels(["问题类型", "文件数"])
+        self.diagnostics_table.setMaximumHeight(150)
+        diagnostics_layout.addWidget(self.diagnostics_table)
+
+        self.diagnostics_text = QTextEdit()
+        self.diagnostics_text.setReadOnly(True)
+        diagnostics_layout.addWidget(self.diagnostics_text)
+        self.diagnostics_dirty = False
+
+        self.export_diagnostics_btn = QPushButton("导出解析诊断")
+        self.export_diagnostics_btn.clicked.connect(self.export_diagnostics)
+        self.export_diagnostics_btn.setEnabled(False)
+        diagnostics_layout.addWidget(self.export_diagnostics_btn)
+
+        self.tab_widget.addTab(self.diagnostics_tab, "解析诊断")
+
         # 日志标签页
         self.log_tab = QWidget()
         log_layout = QVBoxLayout(self.log_tab)
 
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
+        self.log_text.document().setMaximumBlockCount(Logger.MAX_ENTRIES)  # 与日志缓冲区同样只保留最近的条目
         log_layout.addWidget(self.log_text)
 
+        # 后台任务运行期间定时把新日志追加到日志标签页
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(500)
+        self.log_timer.timeout.connect(self.update_logs)
+
         self.clear_log_btn = QPushButton("清空日志")
         self.clear_log_btn.clicked.connect(self.clear_logs)
         log_layout.addWidget(self.clear_log_btn)
 
         self.tab_widget.addTab(self.log_tab, "操作日志")
 
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
         main_layout.addWidget(self.tab_widget)
 
         # 状态栏
@@ -485,80 +425,329 @@ class ERATMainWindow(QMainWindow):
         # 初始禁用按钮
         self.select_dir_btn.setEnabled(False)
         self.refresh_btn.setEnabled(False)
+        self.export_term_btn.setEnabled(False)
+        self.watch_check.setEnabled(False)
         self.course_combo.setEnabled(False)
         self.class_combo.setEnabled(False)
         self.export_student_btn.setEnabled(False)
         self.export_experiment_btn.setEnabled(False)
 
+    def open_store(self):
+        try:
+            from erat_store import SubmissionStore
+
+            self.directory_parser.store = SubmissionStore()
+        except Exception as e:
+            self.logger.warning(f"无法使用本地数据库: {str(e)}")
+            self.directory_parser.store = None
+        return self.directory_parser.store
+
+    def close_store(self):
+        if self.directory_parser.store is not None:
+            self.directory_parser.store.close()
+            self.directory_parser.store = None
+
+    def on_store_toggled(self, checked):
+        self.settings.setValue("use_store", checked)
+        if not checked:
+            self.close_store()
+            self.statusBar().showMessage("已关闭保存会话，下次启动不会恢复名单和扫描结果")
+        elif self.open_store() is not None and self.directory_parser.root_path:
+            # 重新开启时立即写入当前状态，避免下次启动恢复到关闭前的旧会话
+            self.save_session(class_keys=None)
+        self.update_logs()
+
+    def save_session(self, class_keys):
+        try:
+            self.directory_parser.store.save(self.directory_parser, class_keys)
+        except Exception as e:
+            self.logger.warning(f"保存到数据库失败: {str(e)}")
+
+    def load_last_session(self):
+        # 名单和最近一次的扫描结果保存在本地数据库中，启动时直接恢复，无需重新导入和遍历目录
+        if not self.store_check.isChecked() or self.open_store() is None:
+            return
+        try:
+            if not self.directory_parser.store.load(self.directory_parser):
+                return
+        except Exception as e:
+            self.logger.warning(f"无法读取本地数据库: {str(e)}")
+            self.close_store()
+            return
+        self.roster_restored = True
+
+        self.select_dir_btn.setEnabled(bool(self.student_manager.get_all_students()))
+        self.refresh_btn.setEnabled(True)
+        self.export_term_btn.setEnabled(True)
+        self.watch_check.setEnabled(True)
+        self.course_combo.setEnabled(True)
+        self.sync_combos()
+        self.show_current_stats()
+        self.update_diagnostics()
+        self.summary_dirty = True
+        self.statusBar().showMessage(f"已恢复上次的名单和扫描结果：{self.directory_parser.root_path}"
+                                     f"（可重新选择目录或开启实时监视以获取最新提交）")
+        self.update_logs()
+
     def import_students(self):
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择学生名单文件", "", "Excel Files (*.xlsx *.xls)"
+            self, "选择学生名单文件", "", "名单文件 (*.xlsx *.xls *.csv)"
         )
 
         if file_path:
-            self.progress_bar.show()
-            self.progress_bar.setValue(0)
+            # 从数据库恢复的名单由新导入的名单整体替换，否则修正后的姓名、班级会因学号重复而被忽略；
+            # 先导入到新的 StudentManager，成功后再替换，导入失败或取消时保留恢复的名单
+            target = StudentManager() if self.roster_restored else self.student_manager
             self.statusBar().showMessage("正在导入学生名单...")
-            QApplication.processEvents()
-
-            success = self.student_manager.import_from_excel(file_path)
-
-            self.progress_bar.setValue(100)
-            self.progress_bar.hide()
-
-            if success:
-                self.statusBar().showMessage(f"成功导入 {len(self.student_manager.get_all_students())} 名学生")
-                self.select_dir_btn.setEnabled(True)
-                QMessageBox.information(self, "成功", "学生名单导入成功！")
-                self.update_logs()
-            else:
-                self.statusBar().showMessage("学生名单导入失败")
-                QMessageBox.critical(self, "错误", "学生名单导入失败，请检查文件格式！")
+            worker = ImportWorker(target, file_path, self)
+            worker.completed.connect(self.on_import_finished)
+            self.start_task(worker)
+
+    def on_import_finished(self, success):
+        worker = self.worker
+        cancelled = self.finish_task()
+
+        if success:
+            if worker.student_manager is not self.student_manager:
+                self.student_manager.replace_students(worker.student_manager)
+                self.roster_restored = False
+            if self.directory_parser.store is not None:
+                # 只重写名单，数据库中的扫描结果与内存中的一致，不必重写
+                self.save_session(class_keys=[])
+            self.statusBar().showMessage(f"成功导入 {len(self.student_manager.get_all_students())} 名学生")
+            self.select_dir_btn.setEnabled(True)
+            QMessageBox.information(self, "成功", "学生名单导入成功！")
+        elif cancelled:
+            self.statusBar().showMessage("已取消导入学生名单")
+        else:
+            self.statusBar().showMessage("学生名单导入失败")
+            QMessageBox.critical(self, "错误", "学生名单导入失败，请检查文件格式！")
+        self.update_logs()
 
     def select_directory(self):
         dir_path = QFileDialog.getExistingDirectory(self, "选择实验报告目录")
 
         if dir_path:
-            self.progress_bar.show()
-            self.progress_bar.setValue(0)
             self.statusBar().showMessage("正在解析目录...")
-            QApplication.processEvents()
-
-            success = self.directory_parser.parse_directory(dir_path)
+            self.course_combo.clear()
+            self.class_combo.clear()
+            self.refresh_btn.setEnabled(False)
+            self.export_term_btn.setEnabled(False)
+            self.watch_check.setChecked(False)
+            self.watch_check.setEnabled(False)
+            # 解析结束时 on_parse_finished 会重新标记，期间切换标签页不读取正在构建的结果
+            self.summary_dirty = False
+            self.diagnostics_dirty = False
+
+            worker = ParseWorker(self.directory_parser, dir_path, self)
+            worker.course_parsed.connect(self.on_course_parsed)
+            worker.completed.connect(self.on_parse_finished)
+            self.start_task(worker)
+
+    def on_course_parsed(self, course_name):
+        # 每解析完一门课程就加入下拉框，第一门课程会自动选中并显示统计
+        self.course_combo.addItem(course_name)
+        self.course_combo.setEnabled(True)
+
+    def on_parse_finished(self, success):
+        cancelled = self.finish_task()
+
+        if success:
+            self.refresh_btn.setEnabled(True)
+            self.export_term_btn.setEnabled(True)
+            self.watch_check.setEnabled(True)
+            self.refresh_statistics()
+            self.update_diagnostics()
+            self.summary_dirty = True
+            if self.tab_widget.currentWidget() is self.summary_tab:
+                self.update_summary()
+            self.statusBar().showMessage("目录解析完成")
+            QMessageBox.information(self, "成功", "目录解析成功！")
+        else:
+            self.course_combo.clear()
+            self.course_combo.setEnabled(False)
+            if cancelled:
+                self.statusBar().showMessage("已取消目录解析")
+            else:
+                self.statusBar().showMessage("目录解析失败")
+                QMessageBox.critical(self, "错误", "目录解析失败，请检查目录结构！")
+        self.update_logs()
 
-            self.progress_bar.setValue(100)
-            self.progress_bar.hide()
+    def export_term_report(self):
+        output_dir = QFileDialog.getExistingDirectory(self, "选择学期报表导出目录")
+        if not output_dir:
+            return
 
-            if success:
-                self.statusBar().showMessage("目录解析完成")
-                self.refresh_btn.setEnabled(True)
-                self.course_combo.setEnabled(True)
+        file_format, ok = QInputDialog.getItem(self, "导出学期报表", "导出格式:", REPORT_FORMATS, 0, False)
+        if not ok:
+            return
 
-                # 更新课程下拉框
-                self.course_combo.clear()
-                self.course_combo.addItems(self.directory_parser.get_course_names())
+        self.statusBar().showMessage("正在导出学期报表...")
+        self.export_term_btn.setEnabled(False)
+        worker = ExportWorker(self.directory_parser, output_dir, file_format, self)
+        worker.completed.connect(self.on_export_finished)
+        self.start_task(worker)
+
+    def on_export_finished(self, success):
+        worker = self.worker
+        cancelled = self.finish_task()
+        self.export_term_btn.setEnabled(True)
+
+        if success:
+            self.statusBar().showMessage(f"学期报表已导出到 {worker.output_dir}")
+            QMessageBox.information(self, "成功", f"学期报表导出成功，共 {len(worker.files)} 个文件！")
+        elif cancelled:
+            self.statusBar().showMessage("已取消学期报表导出")
+        else:
+            self.statusBar().showMessage("学期报表导出失败")
+            QMessageBox.critical(self, "错误", "学期报表导出失败！")
+        self.update_logs()
 
-                if self.directory_parser.get_course_names():
-                    self.course_combo.setCurrentIndex(0)
+    def start_task(self, worker):
+        self.worker = worker
+        worker.progress.connect(self.on_task_progress)
 
-                QMessageBox.information(self, "成功", "目录解析成功！")
+        self.import_students_btn.setEnabled(False)
+        self.select_dir_btn.setEnabled(False)
+        self.store_check.setEnabled(False)  # 后台任务可能正在写数据库
+        self.progress_bar.setRange(0, 0)  # 总量未知前显示忙碌状态
+        self.progress_bar.show()
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.show()
+        self.log_timer.start()
+
+        worker.start()
+
+    def on_task_progress(self, done, total, message):
+        if total > 0:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+            self.statusBar().showMessage(f"{message} ({done}/{total})")
+        else:
+            self.progress_bar.setRange(0, 0)  # 总量未知，显示忙碌状态
+            self.statusBar().showMessage(f"{message} ({done})")
+
+    def cancel_task(self):
+        if self.worker:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.statusBar().showMessage("正在取消...")
+
+    def finish_task(self):
+        # 后台任务结束后恢复界面，返回任务是否被取消
+        worker = self.worker
+        self.worker = None
+        worker.wait()
+
+        self.log_timer.stop()
+        self.progress_bar.hide()
+        self.cancel_btn.hide()
+        self.import_students_btn.setEnabled(True)
+        self.select_dir_btn.setEnabled(bool(self.student_manager.get_all_students()))
+        self.store_check.setEnabled(True)
+        return worker.cancel_event.is_set()
+
+    def closeEvent(self, event):
+        if self.worker:
+            self.worker.cancel()
+            self.worker.wait()
+        self.stop_watching()
+        super().closeEvent(event)
+
+    def on_watch_toggled(self, checked):
+        if checked:
+            from erat_watch import DirectoryWatcher
+
+            watcher = DirectoryWatcher(self.directory_parser.root_path)
+            try:
+                watcher.start()
+            except Exception as e:
+                # 例如恢复的会话指向的目录已被删除
+                self.logger.error(f"无法监视目录: {str(e)}")
+                self.statusBar().showMessage("无法开启实时监视，请检查目录是否存在")
+                self.watch_check.setChecked(False)
                 self.update_logs()
-            else:
-                self.statusBar().showMessage("目录解析失败")
-                QMessageBox.critical(self, "错误", "目录解析失败，请检查目录结构！")
+                return
+            self.watcher = watcher
+            self.watch_timer.start()
+            self.statusBar().showMessage(f"正在实时监视 {self.directory_parser.root_path}")
+        else:
+            self.stop_watching()
+        self.update_logs()
+
+    def stop_watching(self):
+        self.watch_timer.stop()
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def apply_watch_changes(self):
+        # 后台任务运行时先不取变化，等任务结束后再应用
+        if self.watcher is None or self.worker is not None:
+            return
+        changes = self.watcher.take_changes()
+        if not changes:
+            return
+        refreshed = self.directory_parser.refresh_paths(changes)
+        if not refreshed:
+            return
+
+        self.sync_combos()
+        self.show_current_stats()
+        self.update_diagnostics()
+        self.summary_dirty = True
+        if self.tab_widget.currentWidget() is self.summary_tab:
+            self.update_summary()
+        self.statusBar().showMessage(f"检测到目录变化，已更新 {len(refreshed)} 个班级")
+        self.update_logs()
+
+    def sync_combos(self):
+        # 增量刷新后课程/班级可能增减，尽量保留当前选择，期间屏蔽信号避免重复刷新统计
+        course_name = self.course_combo.currentText()
+        class_name = self.class_combo.currentText()
+
+        course_names = self.directory_parser.get_course_names()
+        if [self.course_combo.itemText(i) for i in range(self.course_combo.count())] != course_names:
+            self.course_combo.blockSignals(True)
+            self.course_combo.clear()
+            self.course_combo.addItems(course_names)
+            if course_name in course_names:
+                self.course_combo.setCurrentText(course_name)
+            self.course_combo.blockSignals(False)
+
+        class_names = self.directory_parser.get_class_names(self.course_combo.currentText())
+        if [self.class_combo.itemText(i) for i in range(self.class_combo.count())] != class_names:
+            self.class_combo.blockSignals(True)
+            self.class_combo.clear()
+            self.class_combo.addItems(class_names)
+            if class_name in class_names:
+                self.class_combo.setCurrentText(class_name)
+            self.class_combo.blockSignals(False)
+        self.class_combo.setEnabled(bool(class_names))
 
     def on_course_changed(self, course_name):
+        class_names = self.directory_parser.get_class_names(course_name)
+
+        # 填充班级下拉框时屏蔽信号，避免每添加一项都触发一次统计刷新
+        self.class_combo.blockSignals(True)
         self.class_combo.clear()
-        self.class_combo.addItems(self.directory_parser.get_class_names(course_name))
+        self.class_combo.addItems(class_names)
+        self.class_combo.blockSignals(False)
 
-        if self.directory_parser.get_class_names(course_name):
+        if class_names:
             self.class_combo.setCurrentIndex(0)
             self.class_combo.setEnabled(True)
+            self.stats_timer.start()
         else:
             self.class_combo.setEnabled(False)
 
     def on_class_changed(self, class_name):
+        # 连续切换时只在停下后刷新一次
+        self.stats_timer.start()
+
+    def show_current_stats(self):
         course_name = self.course_combo.currentText()
+        class_name = self.class_combo.currentText()
         if course_name and class_name:
             self.update_student_stats(course_name, class_name)
             self.update_experiment_stats(course_name, class_name)
@@ -566,77 +755,50 @@ class ERATMainWindow(QMainWindow):
 
             self.export_student_btn.setEnabled(True)
             self.export_experiment_btn.setEnabled(True)
+            return True
+        return False
 
     def refresh_statistics(self):
-        course_name = self.course_combo.currentText()
-        class_name = self.class_combo.currentText()
-
-        if course_name and class_name:
-            self.update_student_stats(course_name, class_name)
-            self.update_experiment_stats(course_name, class_name)
-            self.update_visualization(course_name, class_name)
-
+        self.stats_timer.stop()
+        if self.show_current_stats():
             self.statusBar().showMessage("统计数据已刷新")
 
     def update_student_stats(self, course_name, class_name):
-        stats = self.directory_parser.get_student_stats(course_name, class_name)
-
-        self.student_table.setRowCount(len(stats))
-
-        for row, stat in enumerate(stats):
-            self.student_table.setItem(row, 0, QTableWidgetItem(stat['student_id']))
-            self.student_table.setItem(row, 1, QTableWidgetItem(stat['name']))
-            self.student_table.setItem(row, 2, QTableWidgetItem(stat['grade']))  # 添加年级列
-            self.student_table.setItem(row, 3, QTableWidgetItem(stat['class_name']))  # 添加班级列
-            self.student_table.setItem(row, 4, QTableWidgetItem(str(stat['missing_count'])))
-            self.student_table.setItem(row, 5, QTableWidgetItem(stat['missing_list']))
-
-        self.student_table.resizeColumnsToContents()
+        self.student_table.set_rows(self.directory_parser.get_student_stats(course_name, class_name))
 
     def update_experiment_stats(self, course_name, class_name):
-        stats = self.directory_parser.get_experiment_stats(course_name, class_name)
+        self.experiment_table.set_rows(self.directory_parser.get_experiment_stats(course_name, class_name))
 
-        self.experiment_table.setRowCount(len(stats))
+    def on_tab_changed(self, index):
+        # 解析线程运行时课程/班级字典和诊断记录仍在变化，汇总和诊断等解析结束后再生成
+        parsing = isinstance(self.worker, ParseWorker)
+        if self.tab_widget.widget(index) is self.diagnostics_tab and self.diagnostics_dirty and not parsing:
+            self.render_diagnostics()
 
-        for row, stat in enumerate(stats):
-            self.experiment_table.setItem(row, 0, QTableWidgetItem(stat['experiment_name']))
+        if self.tab_widget.widget(index) is self.summary_tab and self.summary_dirty and not parsing:
+            self.update_summary()
 
-            rate_item = QTableWidgetItem(f"{stat['submission_rate']:.2f}%")
-            # 根据提交率设置不同的颜色
-            if stat['submission_rate'] < 60:
-                rate_item.setBackground(Qt.red)
-            elif stat['submission_rate'] < 80:
-                rate_item.setBackground(Qt.yellow)
-            else:
-                rate_item.setBackground(Qt.green)
-            self.experiment_table.setItem(row, 1, rate_item)
+        if self.tab_widget.widget(index) is self.visualization_tab:
+            if self.canvas is None:
+                from erat_chart import SubmissionRateChart
 
-            self.experiment_table.setItem(row, 2, QTableWidgetItem(stat['missing_students']))
+                self.canvas = SubmissionRateChart(self.visualization_tab, width=7, height=4)
+                self.visualization_tab.layout().addWidget(self.canvas)
 
-        self.experiment_table.resizeColumnsToContents()
+            course_name = self.course_combo.currentText()
+            class_name = self.class_combo.currentText()
+            if self.chart_pending and course_name and class_name:
+                self.update_visualization(course_name, class_name)
 
     def update_visualization(self, course_name, class_name):
-        names, rates = self.directory_parser.get_submission_rates(course_name, class_name)
-
-        self.canvas.fig.clear()
-        ax = self.canvas.fig.add_subplot(111)
-
-        if names and rates:
-            ax.bar(names, rates, color='skyblue')
-            ax.set_title('实验提交率统计')
-            ax.set_xlabel('实验名称')
-            ax.set_ylabel('提交率 (%)')
-            ax.set_ylim(0, 105)
-
-            # 添加数值标签
-            for i, rate in enumerate(rates):
-                ax.text(i, rate + 1, f"{rate:.1f}%", ha='center')
+        # 图表页不可见时只记下需要重绘，切换到该页时再画
+        if self.canvas is None or self.tab_widget.currentWidget() is not self.visualization_tab:
+            self.chart_pending = True
+            return
+        self.chart_pending = False
 
-            self.canvas.fig.tight_layout()
-            self.canvas.draw()
-        else:
-            ax.text(0.5, 0.5, '暂无数据', ha='center', va='center', transform=ax.transAxes)
-            self.canvas.draw()
+        names, rates = self.directory_parser.get_submission_rates(course_name, class_name)
+        self.canvas.show_rates((course_name, class_name, self.directory_parser.generation), names, rates)
 
     def export_student_stats(self):
         course_name = self.course_combo.currentText()
@@ -688,10 +850,59 @@ class ERATMainWindow(QMainWindow):
                 self.statusBar().showMessage("实验统计数据导出失败")
                 QMessageBox.critical(self, "错误", "实验统计数据导出失败！")
 
+    def update_summary(self):
+        summary = self.directory_parser.get_aggregate_stats(CHRONIC_TOP_N)
+        self.course_summary_table.set_rows(summary['courses'])
+        self.grade_summary_table.set_rows(summary['grades'])
+        self.experiment_summary_table.set_rows(summary['experiments'])
+        self.chronic_table.set_rows(summary['chronic'])
+        self.summary_dirty = False
+
+    def update_diagnostics(self):
+        diagnostics = self.directory_parser.diagnostics
+        summary = diagnostics.summary('kind')
+
+        self.diagnostics_table.setRowCount(len(summary))
+        for row, item in enumerate(summary):
+            self.diagnostics_table.setItem(row, 0, QTableWidgetItem(item['label']))
+            self.diagnostics_table.setItem(row, 1, QTableWidgetItem(str(item['count'])))
+        self.diagnostics_table.resizeColumnsToContents()
+        self.export_diagnostics_btn.setEnabled(len(diagnostics) > 0)
+
+        self.diagnostics_text.clear()
+        self.diagnostics_dirty = True
+        if self.tab_widget.currentWidget() is self.diagnostics_tab:
+            self.render_diagnostics()
+
+    def render_diagnostics(self):
+        diagnostics = self.directory_parser.diagnostics
+        lines = diagnostics.format_lines(limit=Logger.MAX_ENTRIES)
+        if len(diagnostics) > len(lines):
+            lines.append(f"…… 仅显示前 {len(lines)} 条，共 {len(diagnostics)} 条，完整内容请导出查看")
+        self.diagnostics_text.setPlainText("\n".join(lines))
+        self.diagnostics_dirty = False
+
+    def export_diagnostics(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "导出解析诊断", "解析诊断.xlsx", "Excel Files (*.xlsx);;CSV Files (*.csv)"
+        )
+
+        if file_path:
+            success = StatisticsExporter.export_diagnostics(self.directory_parser.diagnostics.records, file_path)
+
+            if success:
+                self.statusBar().showMessage(f"解析诊断已导出到 {file_path}")
+                self.logger.log(f"导出解析诊断到 {file_path}")
+                self.update_logs()
+            else:
+                self.statusBar().showMessage("解析诊断导出失败")
+                QMessageBox.critical(self, "错误", "解析诊断导出失败！")
+
     def update_logs(self):
-        self.log_text.clear()
-        for log in self.logger.get_logs():
-            self.log_text.append(log)
+        # 只追加上次刷新之后的新日志
+        self.log_sequence, logs = self.logger.get_logs_since(self.log_sequence)
+        if logs:
+            self.log_text.append("\n".join(logs))
 
     def clear_logs(self):
         self.logger.clear_logs()
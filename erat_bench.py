@@ -0,0 +1,295 @@
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 每个场景在全新的解释器中执行，测得的是冷启动时间（不含操作系统层面的文件缓存影响）
+STARTUP_SCENARIOS = {
+    'core_import': "import erat_core",
+    'cli_import': "import erat_cli",
+    'gui_window': ("from PyQt5.QtWidgets import QApplication\n"
+                   "app = QApplication([])\n"
+                   "import ERAT\n"
+                   "window = ERAT.ERATMainWindow()\n"
+                   "window.show()\n"
+                   "app.processEvents()\n"),
+    'gui_chart': ("from PyQt5.QtWidgets import QApplication\n"
+                  "app = QApplication([])\n"
+                  "import ERAT\n"
+                  "window = ERAT.ERATMainWindow()\n"
+                  "window.show()\n"
+                  "window.tab_widget.setCurrentWidget(window.visualization_tab)\n"
+                  "app.processEvents()\n"),
+}
+
+
+def time_subprocess(code, env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def bench_startup(repeat):
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')  # 无显示器的机器上也能创建窗口
+    results = {}
+    for name, code in STARTUP_SCENARIOS.items():
+        samples = [time_subprocess(code, env) for _ in range(repeat)]
+        results[name] = {
+            'min_s': min(samples),
+            'median_s': statistics.median(samples),
+            'max_s': max(samples),
+            'repeat': repeat,
+        }
+    return results
+
+
+def generate_roster(path, classes, students_per_class, grade="2024"):
+    # 生成名单（.xlsx 或 .csv），返回 [(学号, 姓名, 班级)]；学号从 10000001 开始连续编号
+    students = []
+    for class_index in range(classes):
+        class_name = f"班{class_index + 1:02d}"
+        for i in range(students_per_class):
+            student_id = str(10000001 + class_index * students_per_class + i)
+            students.append((student_id, f"学生{student_id[-5:]}", class_name))
+
+    rows = [('学号', '姓名', '年级', '班级')] + [(sid, name, grade, class_name) for sid, name, class_name in students]
+    if path.endswith('.csv'):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            csv.writer(f).writerows(rows)
+    else:
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)  # 只写模式逐行写出，十万行名单也不占用大量内存
+        sheet = workbook.create_sheet()
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+    return students
+
+
+def generate_tree(root, students, courses, experiments, submit_rate=0.9, bad_name_rate=0.01,
+                  unknown_rate=0.01, name_mismatch_rate=0.02, experiment_mismatch_rate=0.01, seed=0):
+    # 按 课程/班级/实验 三级结构生成空文件，文件名符合默认命名规则；按给定比例混入各类诊断，
+    # 返回 {'files': 文件总数, 'bad_filename': ..., 'unknown_student': ..., 'name_mismatch': ..., ...}
+    rng = random.Random(seed)
+    by_class = {}
+    for student_id, name, class_name in students:
+        by_class.setdefault(class_name, []).append((student_id, name))
+
+    counts = dict.fromkeys(('files', 'bad_filename', 'unknown_student', 'name_mismatch', 'experiment_mismatch'), 0)
+    extensions = ('doc', 'docx', 'pdf', 'txt')
+    unknown_id = 90000001
+    for course_index in range(courses):
+        for class_name, members in by_class.items():
+            for number in range(1, experiments + 1):
+                directory = os.path.join(root, f"课程{course_index + 1:02d}", class_name, f"实验{number}")
+                os.makedirs(directory, exist_ok=True)
+                filenames = []
+                for student_id, name in members:
+                    if rng.random() >= submit_rate:
+                        continue
+                    extension = rng.choice(extensions)
+                    roll = rng.random()
+                    if roll < bad_name_rate:
+                        filenames.append(f"{name}_实验{number}.{extension}")
+                        counts['bad_filename'] += 1
+                        continue
+                    roll -= bad_name_rate
+                    file_number = number
+                    if roll < name_mismatch_rate:
+                        name = "错名" + name
+                        counts['name_mismatch'] += 1
+                    elif roll < name_mismatch_rate + experiment_mismatch_rate:
+                        file_number = number % experiments + 1
+                        counts['experiment_mismatch'] += 1
+                    filenames.append(f"实验{file_number}_{student_id}-{name}.{extension}")
+                unknown = sum(1 for _ in members if rng.random() < unknown_rate)
+                for _ in range(unknown):
+                    filenames.append(f"实验{number}_{unknown_id}-外人{unknown_id % 1000}.pdf")
+                    unknown_id += 1
+                counts['unknown_student'] += unknown
+                for filename in filenames:
+                    open(os.path.join(directory, filename), 'wb').close()
+                counts['files'] += len(filenames)
+    backdate_tree(root)
+    return counts
+
+
+def backdate_tree(root, seconds=3600):
+    # 刚生成的目录 mtime 落在 DirectoryParser.RACY_WINDOW_NS 内，扫描缓存会把它们全部视为不可信而重新列出，
+    # 热缓存解析就测不到缓存的效果；把所有目录的修改时间统一改到一小时前，模拟已经稳定的共享目录
+    timestamp = time.time() - seconds
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (timestamp, timestamp))
+
+
+def _rss_peak_mb():
+    # 进程启动以来的最大常驻内存；Windows 上没有 resource 模块，返回 None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(func, items, trace_memory):
+    # 执行一个阶段，返回 (函数返回值, 结果记录)；trace_memory 时用 tracemalloc 记录该阶段的 Python 内存峰值，
+    # 会拖慢执行，需要纯计时结果时应关闭
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        value = func()
+    finally:
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return value, {
+        'seconds': seconds,
+        'items': items,
+        'per_second': items / seconds if seconds > 0 else None,
+        'peak_mb': peak / 1024 / 1024 if peak is not None else None,
+        'rss_peak_mb': _rss_peak_mb(),
+    }
+
+
+def bench_pipeline(args, work_dir):
+    # 生成合成数据后依次计时：导入模块、导入名单、冷/热缓存解析、增量刷新、各类统计和学期报表导出
+    results = {'config': {key: getattr(args, key) for key in (
+        'courses', 'classes', 'students', 'experiments', 'submit_rate', 'bad_name_rate', 'unknown_rate',
+        'name_mismatch_rate', 'experiment_mismatch_rate', 'roster_format', 'workers', 'seed')},
+        'stages': {}}
+    stages = results['stages']
+    root = os.path.join(work_dir, "tree")
+    roster_path = os.path.join(work_dir, f"roster.{args.roster_format}")
+    cache_dir = os.path.join(work_dir, "cache")
+
+    started = time.perf_counter()
+    shutil.rmtree(root, ignore_errors=True)
+    students = generate_roster(roster_path, args.classes, args.students)
+    generated = generate_tree(root, students, args.courses, args.experiments, args.submit_rate, args.bad_name_rate,
+                              args.unknown_rate, args.name_mismatch_rate, args.experiment_mismatch_rate, args.seed)
+    results['generated'] = dict(generated, students=len(students), seconds=time.perf_counter() - started)
+    file_count = generated['files']
+    class_count = args.courses * args.classes
+
+    erat_core, stages['import_core'] = measure(lambda: __import__('erat_core'), 1, args.trace_memory)
+    if not args.verbose:
+        logger = erat_core.Logger()
+        for sink in list(logger.sinks):
+            logger.remove_sink(sink)
+
+    student_manager = erat_core.StudentManager()
+    _, stages['import_roster'] = measure(lambda: student_manager.import_from_excel(roster_path),
+                                         len(students), args.trace_memory)
+
+    def parse():
+        directory_parser = erat_core.DirectoryParser(student_manager, max_workers=args.workers, cache_dir=cache_dir)
+        if not directory_parser.parse_directory(root):
+            raise RuntimeError(f"解析失败: {root}")
+        return directory_parser
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    _, stages['parse_cold'] = measure(parse, file_count, args.trace_memory)
+    directory_parser, stages['parse_warm'] = measure(parse, file_count, args.trace_memory)
+    results['diagnostics'] = dict(directory_parser.diagnostics.counts)
+    # 热缓存解析仍需重新列出的实验目录数，应为 0，否则 parse_warm 的结果不代表缓存命中的情况
+    results['racy_manifest_entries'] = sum(1 for entry in directory_parser.scan_manifest.values() if entry.get('racy'))
+
+    # 在一个实验目录中新增一个文件，测量单个目录变化的增量刷新
+    course_name = directory_parser.get_course_names()[0]
+    class_name = directory_parser.get_class_names(course_name)[0]
+    experiment_dir = os.path.join(root, course_name, class_name, "实验1")
+    student_id, name, _ = students[0]
+    open(os.path.join(experiment_dir, f"实验1_{student_id}-{name}.pdf"), 'wb').close()
+    _, stages['refresh_one_dir'] = measure(lambda: directory_parser.refresh_paths([experiment_dir]), 1,
+                                           args.trace_memory)
+
+    class_keys = [(course, class_name) for course in directory_parser.get_course_names()
+                  for class_name in directory_parser.get_class_names(course)]
+
+    def all_classes(method):
+        return lambda: [method(course, class_name) for course, class_name in class_keys]
+
+    _, stages['student_stats'] = measure(all_classes(directory_parser.get_student_stats), class_count,
+                                         args.trace_memory)
+    _, stages['experiment_stats'] = measure(all_classes(directory_parser.get_experiment_stats), class_count,
+                                            args.trace_memory)
+    _, stages['submission_rates'] = measure(all_classes(directory_parser.get_submission_rates), class_count,
+                                            args.trace_memory)
+    _, stages['aggregate_stats'] = measure(directory_parser.get_aggregate_stats, class_count, args.trace_memory)
+
+    if not args.skip_export:
+        export_dir = os.path.join(work_dir, "report")
+        shutil.rmtree(export_dir, ignore_errors=True)
+        _, stages['term_report_csv'] = measure(
+            lambda: erat_core.StatisticsExporter.export_term_report(directory_parser, export_dir, 'csv'),
+            class_count, args.trace_memory)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ERAT 性能基准测试，结果以 JSON 输出")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup = subparsers.add_parser("startup", help="测量命令行与图形界面的冷启动时间")
+    startup.add_argument("-n", "--repeat", type=int, default=5, help="每个场景重复启动的次数")
+
+    pipeline = subparsers.add_parser("pipeline", help="生成合成名单和目录，测量导入、解析、统计和导出各阶段")
+    pipeline.add_argument("--courses", type=int, default=4, help="课程数")
+    pipeline.add_argument("--classes", type=int, default=10, help="班级数（每个课程都包含全部班级）")
+    pipeline.add_argument("--students", type=int, default=40, help="每个班级的学生数")
+    pipeline.add_argument("--experiments", type=int, default=12, help="每个班级的实验数")
+    pipeline.add_argument("--submit-rate", type=float, default=0.9, help="每个学生提交每个实验的概率")
+    pipeline.add_argument("--bad-name-rate", type=float, default=0.01, help="提交文件名不符合命名规则的比例")
+    pipeline.add_argument("--unknown-rate", type=float, default=0.01, help="每个实验目录中名单外学生文件的比例")
+    pipeline.add_argument("--name-mismatch-rate", type=float, default=0.02, help="文件名中姓名与名单不符的比例")
+    pipeline.add_argument("--experiment-mismatch-rate", type=float, default=0.01,
+                          help="文件名中实验编号与所在目录不符的比例")
+    pipeline.add_argument("--roster-format", choices=("xlsx", "csv"), default="xlsx", help="生成的名单格式")
+    pipeline.add_argument("-j", "--workers", type=int, default=None, help="解析目录的线程数")
+    pipeline.add_argument("--seed", type=int, default=0, help="随机种子，相同参数和种子生成的数据完全相同")
+    pipeline.add_argument("--work-dir", help="生成数据的目录，指定时运行结束后保留，默认使用临时目录")
+    pipeline.add_argument("--no-tracemalloc", dest="trace_memory", action="store_false",
+                          help="不用 tracemalloc 记录各阶段内存峰值，得到不受其拖慢的计时")
+    pipeline.add_argument("--skip-export", action="store_true", help="不测量学期报表导出")
+    pipeline.add_argument("-v", "--verbose", action="store_true", help="保留 ERAT 的控制台日志")
+
+    parser.add_argument("-o", "--output", help="结果写入的 JSON 文件，默认输出到控制台")
+    args = parser.parse_args(argv)
+
+    if args.command == "startup":
+        results = {'startup': bench_startup(args.repeat)}
+    elif args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+        results = {'pipeline': bench_pipeline(args, os.path.abspath(args.work_dir))}
+    else:
+        with tempfile.TemporaryDirectory(prefix="erat_bench_") as work_dir:
+            results = {'pipeline': bench_pipeline(args, work_dir)}
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+
+FONT_FALLBACKS = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Zen Hei']  # Windows常用字体
+IMAGE_CACHE_SIZE = 16  # 每幅缓存图像约 1 MB，只保留最近显示过的若干个班级
+
+matplotlib.rcParams['font.sans-serif'] = FONT_FALLBACKS + ['DejaVu Sans']  # 都未安装时回退到 matplotlib 自带字体
+matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+
+
+class Canvas(FigureCanvas):
+    def __init__(self, parent=None, width=5, height=4, dpi=100):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        super().__init__(self.fig)
+        self.setParent(parent)
+
+
+class SubmissionRateChart(Canvas):
+    # 提交率柱状图：实验列表不变时只更新柱高和标签并局部重绘（blit），不再清空整个图表
+    def __init__(self, parent=None, width=5, height=4, dpi=100):
+        super().__init__(parent, width, height, dpi)
+        self.ax = None
+        self.names = None  # 当前图表对应的实验名列表
+        self.bars = []
+        self.labels = []
+        self.background = None  # 不含柱子和数值标签的背景图像
+        self.image_cache = OrderedDict()  # 缓存键 -> 已渲染的整幅图像，按最近使用排序
+        self.image_generation = None  # 缓存中图像对应的解析代数
+        self.mpl_connect('draw_event', self._on_draw)
+        self.mpl_connect('resize_event', self._on_resize)
+
+    def show_rates(self, key, names, rates):
+        # key 通常为 (课程名, 班级名, 解析代数)，同一 key 再次显示时直接贴回缓存的图像
+        if names != self.names or self.background is None:
+            self._rebuild(names)
+
+        # 解析代数变化后旧图像不会再被用到（实时监视时每次刷新都会产生新的代数），直接丢弃
+        generation = key[-1] if isinstance(key, tuple) else None
+        if generation != self.image_generation:
+            self.image_cache.clear()
+            self.image_generation = generation
+
+        self._update_artists(rates)
+        image = self.image_cache.get(key)
+        if image is not None:
+            self.image_cache.move_to_end(key)
+            self.restore_region(image)
+        else:
+            self.restore_region(self.background)
+            self._draw_animated()
+            self.image_cache[key] = self.copy_from_bbox(self.fig.bbox)
+            if len(self.image_cache) > IMAGE_CACHE_SIZE:
+                self.image_cache.popitem(last=False)
+        self.blit(self.fig.bbox)
+
+    def _rebuild(self, names):
+        self.fig.clear()
+        self.ax = self.fig.add_subplot(111)
+        self.names = list(names)
+        self.bars = []
+        self.labels = []
+
+        if names:
+            self.bars = list(self.ax.bar(names, [0] * len(names), color='skyblue', animated=True))
+            self.labels = [self.ax.text(i, 0, "", ha='center', animated=True) for i in range(len(names))]
+            self.ax.set_title('实验提交率统计')
+            self.ax.set_xlabel('实验名称')
+            self.ax.set_ylabel('提交率 (%)')
+            self.ax.set_ylim(0, 105)
+            self.fig.tight_layout()
+        else:
+            self.ax.text(0.5, 0.5, '暂无数据', ha='center', va='center', transform=self.ax.transAxes)
+
+        self.draw()  # 触发 draw_event，保存新的背景
+
+    def _update_artists(self, rates):
+        for bar, label, rate in zip(self.bars, self.labels, rates):
+            bar.set_height(rate)
+            # 添加数值标签
+            label.set_y(rate + 1)
+            label.set_text(f"{rate:.1f}%")
+
+    def _draw_animated(self):
+        for artist in self.bars + self.labels:
+            self.fig.draw_artist(artist)
+
+    def _on_draw(self, event):
+        # 完整重绘（新建图表、窗口缩放等）后背景改变，缓存的图像全部失效
+        self.background = self.copy_from_bbox(self.fig.bbox)
+        self.image_cache.clear()
+        self._draw_animated()
+
+    def _on_resize(self, event):
+        # 尺寸变化后旧图像不能再贴回，等待下一次完整重绘
+        self.background = None
+        self.image_cache.clear()
@@ -0,0 +1,150 @@
+import argparse
+import os
+import sys
+import time
+
+from erat_core import (CACHE_DIR, REPORT_FORMATS, DirectoryParser, StudentManager, Logger, RotatingFileSink,
+                       StatisticsExporter, FactTableWriter, PatternRegistry)
+
+
+LOG_LEVELS = {'debug': Logger.DEBUG, 'info': Logger.INFO, 'warning': Logger.WARNING, 'error': Logger.ERROR}
+
+
+def add_common_arguments(parser):
+    # 命令行模式和统计服务共用的参数：名单、目录、解析选项和日志选项
+    parser.add_argument("roster", help="学生名单文件（.xlsx/.xls/.csv）")
+    parser.add_argument("root", help="实验报告根目录（课程/班级/实验 三级结构）")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="解析目录的线程数，默认由系统决定")
+    parser.add_argument("--patterns", help="文件命名规则配置（JSON），可按课程设置不同规则")
+    parser.add_argument("--experiment-mismatch", choices=DirectoryParser.MISMATCH_POLICIES, default="flag",
+                        help="文件名中的实验编号与所在目录不一致时：flag 记录诊断并照常计入，"
+                             "reassign 改计入编号相同的实验，reject 不计入")
+    parser.add_argument("--store", help="把名单和扫描结果写入该 SQLite 数据库，供图形界面或其它工具直接读取")
+    parser.add_argument("--no-cache", action="store_true", help="不读取也不保存扫描缓存")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="info", help="记录日志的最低级别")
+    parser.add_argument("--log-file", help="同时写入按大小轮转的日志文件")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不在控制台输出日志")
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="实验报告统计分析工具 (ERAT) 命令行模式：导入名单、解析目录并导出所有课程/班级的统计")
+    add_common_arguments(parser)
+    parser.add_argument("-o", "--output-dir", default=".", help="统计结果输出目录，默认当前目录")
+    parser.add_argument("--term-report", choices=REPORT_FORMATS,
+                        help="改为导出整个学期的汇总报表（xlsx 按课程分工作簿，csv/parquet 为长表）")
+    parser.add_argument("--facts", help="解析时把逐个学生/实验的提交明细写入该文件（.csv 或 .parquet）")
+    parser.add_argument("--duplicates", help="对提交文件按内容查重，把重复组导出到该文件（.xlsx 或 .csv）")
+    parser.add_argument("--similarity", help="检测内容高度相似的提交（txt/docx/pdf），把文件对导出到该文件（.xlsx 或 .csv）")
+    parser.add_argument("--similarity-threshold", type=float, default=0.8, help="报告的最低估计相似度，默认 0.8")
+    parser.add_argument("--diagnostics", help="把解析诊断明细导出到该文件（.xlsx 或 .csv）")
+    return parser
+
+
+def setup_logging(args):
+    logger = Logger()
+    logger.set_level(LOG_LEVELS[args.log_level])
+    if args.quiet:
+        for sink in list(logger.sinks):
+            logger.remove_sink(sink)
+    if args.log_file:
+        logger.add_sink(RotatingFileSink(args.log_file))
+    return logger
+
+
+def create_parser(args):
+    # 按 add_common_arguments 的参数导入名单并创建 DirectoryParser（尚未解析目录），失败时返回 None
+    student_manager = StudentManager()
+    if not student_manager.import_from_excel(args.roster):
+        return None
+
+    try:
+        patterns = PatternRegistry.load(args.patterns) if args.patterns else None
+    except (OSError, ValueError, KeyError) as e:
+        Logger().error(f"读取命名规则失败: {str(e)}")
+        return None
+    directory_parser = DirectoryParser(student_manager, max_workers=args.workers,
+                                       cache_dir=None if args.no_cache else CACHE_DIR, patterns=patterns,
+                                       experiment_mismatch=args.experiment_mismatch)
+    if args.store:
+        from erat_store import SubmissionStore
+
+        directory_parser.store = SubmissionStore(args.store)
+    return directory_parser
+
+
+def export_all(directory_parser, output_dir):
+    # 为每个课程/班级导出学生统计和实验统计，文件名与图形界面的默认导出名一致
+    exported = 0
+    for course_name in directory_parser.get_course_names():
+        for class_name in directory_parser.get_class_names(course_name):
+            student_stats = directory_parser.get_student_stats(course_name, class_name)
+            if StatisticsExporter.export_student_stats_to_excel(
+                    student_stats, os.path.join(output_dir, f"{course_name}_{class_name}_学生统计.xlsx")):
+                exported += 1
+
+            experiment_stats = directory_parser.get_experiment_stats(course_name, class_name)
+            if StatisticsExporter.export_experiment_stats_to_excel(
+                    experiment_stats, os.path.join(output_dir, f"{course_name}_{class_name}_实验统计.xlsx")):
+                exported += 1
+    return exported
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    logger = setup_logging(args)
+    started = time.perf_counter()
+    directory_parser = create_parser(args)
+    if directory_parser is None:
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    fact_writer = None
+    if args.facts:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(args.facts)), exist_ok=True)
+            fact_writer = FactTableWriter(args.facts)
+        except (OSError, ImportError) as e:
+            logger.error(f"无法创建提交明细文件: {str(e)}")
+            return 1
+    try:
+        parsed = directory_parser.parse_directory(args.root, fact_writer=fact_writer)
+    finally:
+        if fact_writer is not None:
+            fact_writer.close()
+    if not parsed:
+        return 1
+    if fact_writer is not None:
+        logger.log(f"提交明细: {fact_writer.row_count} 行 -> {args.facts}")
+
+    if args.diagnostics:
+        StatisticsExporter.export_diagnostics(directory_parser.diagnostics.records, args.diagnostics)
+
+    if args.duplicates:
+        from erat_dedup import find_duplicates
+
+        groups = find_duplicates(directory_parser, cache_dir=None if args.no_cache else CACHE_DIR)
+        if groups:
+            StatisticsExporter.export_duplicates(groups, args.duplicates)
+
+    if args.similarity:
+        from erat_similarity import find_similar
+
+        pairs = find_similar(directory_parser, threshold=args.similarity_threshold,
+                             cache_dir=None if args.no_cache else CACHE_DIR)
+        if pairs:
+            StatisticsExporter.export_similar_pairs(pairs, args.similarity)
+
+    if args.term_report:
+        files = StatisticsExporter.export_term_report(directory_parser, args.output_dir, args.term_report)
+        if not files:
+            return 1
+        exported = len(files)
+    else:
+        exported = export_all(directory_parser, args.output_dir)
+    logger.log(f"命令行模式完成：导出 {exported} 个文件到 {args.output_dir}，"
+               f"耗时 {time.perf_counter() - started:.2f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
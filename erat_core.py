@@ -0,0 +1,1744 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import hashlib
+import statistics
+import datetime
+import threading
+import queue
+import atexit
+from collections import Counter, deque
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".erat")  # 本地缓存目录
+MANIFEST_VERSION = 2  # 扫描清单格式版本，格式变化时递增使旧缓存失效
+
+
+class StudentIdTable:
+    # 全局学号驻留表：每个学号对应一个固定的整数序号，实验中只保存序号
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance.ordinals = {}  # 学号 -> 序号
+            cls._instance.ids = []  # 序号 -> 学号
+            cls._instance.lock = threading.Lock()
+        return cls._instance
+
+    def ordinal(self, student_id):
+        ordinal = self.ordinals.get(student_id)
+        if ordinal is None:
+            # 解析线程可能同时登记名单外的学号，分配序号时加锁
+            with self.lock:
+                ordinal = self.ordinals.get(student_id)
+                if ordinal is None:
+                    ordinal = len(self.ids)
+                    self.ids.append(sys.intern(student_id))
+                    self.ordinals[self.ids[ordinal]] = ordinal
+        return ordinal
+
+    def student_id(self, ordinal):
+        return self.ids[ordinal]
+
+
+STUDENT_IDS = StudentIdTable()
+
+
+class Student:
+    __slots__ = ('student_id', 'ordinal', 'name', 'grade', 'class_name', 'missing_experiments')
+
+    def __init__(self, student_id, name, grade="", class_name=""):
+        self.ordinal = STUDENT_IDS.ordinal(student_id)
+        self.student_id = STUDENT_IDS.student_id(self.ordinal)  # 与驻留表共用同一个字符串对象
+        self.name = name
+        self.grade = grade  # 新增年级属性
+        self.class_name = class_name  # 新增班级属性
+        self.missing_experiments = []
+
+    def add_missing_experiment(self, experiment_name):
+        self.missing_experiments.append(experiment_name)
+
+
+class Experiment:
+    __slots__ = ('name', 'submitted_ordinals')
+
+    def __init__(self, name):
+        self.name = name
+        self.submitted_ordinals = array('I')  # 已提交学生的学号序号，升序且不重复
+
+    @property
+    def submitted_students(self):
+        return {STUDENT_IDS.student_id(ordinal) for ordinal in self.submitted_ordinals}
+
+    def add_submitted_student(self, student_id):
+        ordinal = STUDENT_IDS.ordinal(student_id)
+        ordinals = self.submitted_ordinals
+        i = bisect_left(ordinals, ordinal)
+        if i == len(ordinals) or ordinals[i] != ordinal:
+            ordinals.insert(i, ordinal)
+
+    def has_submitted(self, student_id):
+        ordinal = STUDENT_IDS.ordinals.get(student_id)
+        if ordinal is None:
+            return False
+        ordinals = self.submitted_ordinals
+        i = bisect_left(ordinals, ordinal)
+        return i < len(ordinals) and ordinals[i] == ordinal
+
+    def get_submitted_count(self):
+        return len(self.submitted_ordinals)
+
+    def get_missing_students(self, all_students):
+        return {student.student_id for student in all_students if not self.has_submitted(student.student_id)}
+
+    def get_submission_rate(self, total_students):
+        if total_students == 0:
+            return 0
+        return self.get_submitted_count() / total_students * 100
+
+
+class SubmissionMatrix:
+    # 班级 × 实验 的提交矩阵：每个实验一个整数位图，第 i 位表示班级名单中第 i 个学生已提交
+    def __init__(self, students, experiments, roster_version=0):
+        self.students = list(students)
+        self.index = {student.ordinal: i for i, student in enumerate(self.students)}  # 学号序号 -> 名单位置
+        self.full_mask = (1 << len(self.students)) - 1
+        self.roster_version = roster_version
+        self.masks = {}  # 实验名 -> 位图
+        self.submitted_counts = {}  # 实验名 -> 提交人数（含名单外的学生，与原提交率口径一致）
+
+        self.grade_masks = {}  # 年级 -> 该年级学生对应位为 1 的位图
+        for i, student in enumerate(self.students):
+            self.grade_masks[student.grade] = self.grade_masks.get(student.grade, 0) | (1 << i)
+
+        for experiment in experiments:
+            bits = bytearray((len(self.students) + 7) // 8)
+            for ordinal in experiment.submitted_ordinals:
+                i = self.index.get(ordinal)
+                if i is not None:
+                    bits[i >> 3] |= 1 << (i & 7)
+            self.masks[experiment.name] = int.from_bytes(bits, 'little')
+            self.submitted_counts[experiment.name] = experiment.get_submitted_count()
+
+    def get_submission_rate(self, experiment_name):
+        if not self.students:
+            return 0
+        return self.submitted_counts[experiment_name] / len(self.students) * 100
+
+    def get_roster_submitted_count(self, experiment_name, mask=None):
+        # 名单内已提交的人数，可用 mask 只统计部分学生（如某个年级）
+        submitted = self.masks[experiment_name] & self.full_mask
+        if mask is not None:
+            submitted &= mask
+        return submitted.bit_count()
+
+    def get_missing_students(self, experiment_name):
+        # 按名单顺序返回未提交的学生
+        missing = self.full_mask & ~self.masks[experiment_name]
+        students = []
+        while missing:
+            low = missing & -missing
+            students.append(self.students[low.bit_length() - 1])
+            missing ^= low
+        return students
+
+
+class Class:
+    __slots__ = ('name', 'experiments', 'matrix')
+
+    def __init__(self, name):
+        self.name = name
+        self.experiments = {}  # 实验名 -> Experiment对象
+        self.matrix = None  # 解析完成后构建的 SubmissionMatrix
+
+    def add_experiment(self, experiment_name):
+        if experiment_name not in self.experiments:
+            self.experiments[experiment_name] = Experiment(experiment_name)
+        return self.experiments[experiment_name]
+
+    def get_experiment(self, experiment_name):
+        return self.experiments.get(experiment_name)
+
+
+class Course:
+    __slots__ = ('name', 'classes')
+
+    def __init__(self, name):
+        self.name = name
+        self.classes = {}  # 班级名 -> Class对象
+
+    def add_class(self, class_name):
+        if class_name not in self.classes:
+            self.classes[class_name] = Class(class_name)
+        return self.classes[class_name]
+
+    def get_class(self, class_name):
+        return self.classes.get(class_name)
+
+
+class Diagnostic:
+    # 解析过程中发现的一条问题记录；文本只在需要显示或导出时才格式化
+    BAD_FILENAME = 'bad_filename'
+    UNKNOWN_STUDENT = 'unknown_student'
+    NAME_MISMATCH = 'name_mismatch'
+    EXPERIMENT_MISMATCH = 'experiment_mismatch'
+    LABELS = {
+        BAD_FILENAME: "文件名格式错误",
+        UNKNOWN_STUDENT: "学生不在名单中",
+        NAME_MISMATCH: "学生姓名不匹配",
+        EXPERIMENT_MISMATCH: "实验编号不符",
+    }
+    FIELDS = ('kind', 'course', 'class_name', 'experiment', 'filename', 'student_id', 'name', 'expected_name',
+              'file_experiment')
+
+    __slots__ = FIELDS
+
+    def __init__(self, kind, course, class_name, experiment, filename, student_id="", name="", expected_name="",
+                 file_experiment=""):
+        self.kind = kind
+        self.course = course
+        self.class_name = class_name
+        self.experiment = experiment
+        self.filename = filename
+        self.student_id = student_id
+        self.name = name  # 文件名中的学生姓名
+        self.expected_name = expected_name  # 名单中的学生姓名
+        self.file_experiment = file_experiment  # 文件名中的实验编号
+
+    @property
+    def label(self):
+        return self.LABELS.get(self.kind, self.kind)
+
+    @property
+    def path(self):
+        # 相对于实验报告根目录的路径
+        return os.path.join(self.course, self.class_name, self.experiment, self.filename)
+
+    def format(self):
+        if self.kind == self.BAD_FILENAME:
+            return f"{self.label}: {self.path}"
+        if self.kind == self.NAME_MISMATCH:
+            return f"{self.label}: 文件中为{self.name}，名单中为{self.expected_name}({self.student_id}) - {self.path}"
+        if self.kind == self.EXPERIMENT_MISMATCH:
+            return f"{self.label}: 文件中为实验{self.file_experiment} - {self.path}"
+        return f"{self.label}: {self.name}({self.student_id}) - {self.path}"
+
+    def to_dict(self):
+        row = {field: getattr(self, field) for field in self.FIELDS}
+        row['label'] = self.label
+        row['path'] = self.path
+        return row
+
+
+class DiagnosticCollector:
+    def __init__(self):
+        self.records = []
+        self.counts = Counter()  # 类型 -> 条数
+
+    def extend(self, diagnostics):
+        self.records.extend(diagnostics)
+        self.counts.update(diagnostic.kind for diagnostic in diagnostics)
+
+    def clear(self):
+        self.records = []
+        self.counts = Counter()
+
+    def replace_class(self, course, class_name, diagnostics=()):
+        # 某个班级重新扫描后替换该班级的诊断记录
+        self.records = [diagnostic for diagnostic in self.records
+                        if diagnostic.course != course or diagnostic.class_name != class_name]
+        self.records.extend(diagnostics)
+        self.counts = Counter(diagnostic.kind for diagnostic in self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def filter(self, kind=None, course=None, class_name=None, experiment=None):
+        return [diagnostic for diagnostic in self.records
+                if (kind is None or diagnostic.kind == kind)
+                and (course is None or diagnostic.course == course)
+                and (class_name is None or diagnostic.class_name == class_name)
+                and (experiment is None or diagnostic.experiment == experiment)]
+
+    def summary(self, *fields):
+        # 按给定字段分组计数，例如 summary('kind') 或 summary('course', 'class_name', 'kind')
+        fields = fields or ('kind',)
+        counts = Counter(tuple(getattr(diagnostic, field) for field in fields) for diagnostic in self.records)
+        rows = []
+        for key, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            row = dict(zip(fields, key))
+            if 'kind' in row:
+                row['label'] = Diagnostic.LABELS.get(row['kind'], row['kind'])
+            row['count'] = count
+            rows.append(row)
+        return rows
+
+    def format_lines(self, limit=None):
+        records = self.records if limit is None else self.records[:limit]
+        return [diagnostic.format() for diagnostic in records]
+
+
+class FilenamePattern:
+    # 一种实验报告命名规则；正则必须包含 experiment、student_id、name 三个命名分组，并与整个文件名匹配
+    # prefix/extensions 用于在运行正则前快速排除不可能匹配的文件名
+    GROUPS = ('experiment', 'student_id', 'name')
+
+    def __init__(self, name, regex, prefix="", extensions=()):
+        self.name = name
+        try:
+            self.regex = re.compile(regex)
+        except re.error as e:
+            raise ValueError(f"命名规则 {name} 的正则无效: {str(e)}") from e
+        missing = [group for group in self.GROUPS if group not in self.regex.groupindex]
+        if missing:
+            raise ValueError(f"命名规则 {name} 缺少分组: {', '.join(missing)}")
+        if isinstance(extensions, str):
+            # tuple(".zip") 会拆成单个字符，导致几乎所有文件都能通过扩展名检查
+            raise ValueError(f"命名规则 {name} 的 extensions 应为列表，而不是字符串: {extensions!r}")
+        self.prefix = prefix
+        self.extensions = tuple(extensions)
+
+    def rule(self):
+        # 匹配循环使用的元组：(规则名, 前缀, 扩展名, fullmatch, 分组序号)
+        return (self.name, self.prefix, self.extensions or ('',), self.regex.fullmatch,
+                tuple(self.regex.groupindex[group] for group in self.GROUPS))
+
+    def to_dict(self):
+        return {'name': self.name, 'regex': self.regex.pattern, 'prefix': self.prefix,
+                'extensions': list(self.extensions)}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError(f"命名规则应为对象，而不是: {data!r}")
+        for key in ('name', 'regex'):
+            if not isinstance(data.get(key), str):
+                raise ValueError(f"命名规则缺少字符串字段 {key}: {data!r}")
+        prefix = data.get('prefix', "")
+        extensions = data.get('extensions', ())
+        if not isinstance(prefix, str):
+            raise ValueError(f"命名规则 {data['name']} 的 prefix 应为字符串: {prefix!r}")
+        if not isinstance(extensions, (list, tuple, str)) or not all(isinstance(ext, str) for ext in extensions):
+            raise ValueError(f"命名规则 {data['name']} 的 extensions 应为字符串列表: {extensions!r}")
+        return cls(data['name'], data['regex'], prefix, extensions)
+
+
+DEFAULT_PATTERNS = (
+    FilenamePattern('default', r'实验(?P<experiment>\d+)_(?P<student_id>\d+)-(?P<name>\w+)\.(?:doc|docx|pdf|txt)',
+                    prefix='实验', extensions=('.doc', '.docx', '.pdf', '.txt')),
+)
+
+
+def match_filenames(patterns, filenames):
+    # 返回 {文件名: [实验编号, 学号, 姓名, 规则名]}；先检查前缀和扩展名，通过后才运行正则
+    rules = [pattern.rule() for pattern in patterns]
+    matches = {}
+    if len(rules) == 1:
+        # 常见情况只有一条规则，省去内层循环
+        name, prefix, extensions, fullmatch, groups = rules[0]
+        for filename in filenames:
+            if filename.startswith(prefix) and filename.endswith(extensions):
+                match = fullmatch(filename)
+                if match:
+                    matches[filename] = [*match.group(*groups), name]
+        return matches
+
+    for filename in filenames:
+        for name, prefix, extensions, fullmatch, groups in rules:
+            if filename.startswith(prefix) and filename.endswith(extensions):
+                match = fullmatch(filename)
+                if match:
+                    matches[filename] = [*match.group(*groups), name]
+                    break
+    return matches
+
+
+class PatternRegistry:
+    # 按课程配置的命名规则，未单独配置的课程使用默认规则；规则按顺序尝试，第一个匹配的生效
+    def __init__(self, default_patterns=DEFAULT_PATTERNS):
+        self.default_patterns = tuple(default_patterns)
+        self.course_patterns = {}  # 课程名 -> (FilenamePattern, ...)
+        self.signatures = {}  # 规则组 -> 签名，写入扫描清单，规则变化后缓存的匹配结果失效
+
+    def set_course_patterns(self, course_name, patterns):
+        self.course_patterns[course_name] = tuple(patterns)
+
+    def patterns_for(self, course_name):
+        return self.course_patterns.get(course_name, self.default_patterns)
+
+    def signature(self, course_name):
+        patterns = self.patterns_for(course_name)
+        signature = self.signatures.get(patterns)
+        if signature is None:
+            text = json.dumps([pattern.to_dict() for pattern in patterns], ensure_ascii=False, sort_keys=True)
+            signature = hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+            self.signatures[patterns] = signature
+        return signature
+
+    @classmethod
+    def load(cls, path):
+        # JSON 格式：{"default": [规则, ...], "courses": {"课程名": [规则, ...]}}，
+        # 规则为 {"name", "regex", "prefix", "extensions"}，省略 default 时使用内置规则
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("命名规则文件的顶层应为对象")
+        registry = cls(cls._load_patterns(data['default'], "default") if 'default' in data else DEFAULT_PATTERNS)
+        courses = data.get('courses', {})
+        if not isinstance(courses, dict):
+            raise ValueError("命名规则文件的 courses 应为 {课程名: [规则, ...]} 对象")
+        for course_name, items in courses.items():
+            registry.set_course_patterns(course_name, cls._load_patterns(items, f"课程 {course_name}"))
+        return registry
+
+    @staticmethod
+    def _load_patterns(items, owner):
+        if not isinstance(items, list):
+            raise ValueError(f"{owner} 的命名规则应为列表，而不是: {items!r}")
+        return [FilenamePattern.from_dict(item) for item in items]
+
+
+class DirectoryParser:
+    # 目录 mtime 距扫描时刻小于该值（纳秒）时不信任缓存，避免同一时间粒度内的修改被漏掉
+    RACY_WINDOW_NS = 2 * 10 ** 9
+    # 文件名中的实验编号与所在实验目录的编号不一致时的处理方式：
+    # flag 仍计入所在目录并记录诊断；reassign 改计入同班级编号相同的实验目录（不存在时同 flag）；reject 不计入
+    MISMATCH_POLICIES = ('flag', 'reassign', 'reject')
+    EXPERIMENT_NUMBER = re.compile(r'\d+')
+
+    def __init__(self, student_manager, max_workers=None, cache_dir=None, patterns=None, experiment_mismatch='flag'):
+        if experiment_mismatch not in self.MISMATCH_POLICIES:
+            raise ValueError(f"不支持的实验编号处理方式: {experiment_mismatch}")
+        self.student_manager = student_manager
+        self.patterns = patterns or PatternRegistry()  # 按课程配置的文件命名规则
+        self.experiment_mismatch = experiment_mismatch
+        self.courses = {}  # 课程名 -> Course对象
+        self.logger = Logger()
+        self.max_workers = max_workers  # 线程池大小，None 表示使用默认值，1 表示串行解析
+        self.cache_dir = cache_dir  # 扫描清单保存目录，None 表示只在内存中保留
+        self.root_path = None
+        self.scan_manifest = {}  # "课程/班级/实验" -> {mtime_ns, patterns, files, matches}
+        self.pattern_stats = Counter()  # 最近一次解析中每条命名规则匹配的文件数
+        self.missing_index = {}  # (课程名, 班级名) -> (SubmissionMatrix, {学号: [缺交实验名]})
+        self.diagnostics = DiagnosticCollector()  # 最近一次解析发现的问题
+        self.generation = 0  # 解析代数，每次解析开始和结束时递增，用于判断统计缓存是否过期
+        self.stats_cache = {}  # (统计类型, 课程名, 班级名) -> 统计结果
+        self.stats_cache_key = None  # 缓存对应的 (解析代数, 名单版本)
+        self.store = None  # 可选的持久化存储（erat_store.SubmissionStore），解析结束时写入
+
+    def parse_directory(self, root_path, progress_callback=None, course_callback=None, cancel_event=None,
+                        fact_writer=None):
+        # progress_callback(已完成班级数, 班级总数, "课程/班级")：每解析完一个班级回调一次
+        # course_callback(课程名)：某门课程的全部班级解析完成后回调，可用于逐步填充界面
+        # cancel_event：threading.Event，置位后尽快停止解析并返回 False
+        # fact_writer：FactTableWriter，每解析完一个班级就把该班级的提交明细写出，由调用方负责关闭
+        self.courses = {}
+        self.missing_index = {}
+        self.diagnostics.clear()
+        self.generation += 1
+        for student in self.student_manager.get_all_students():
+            student.missing_experiments = []
+        if not os.path.exists(root_path):
+            self.logger.error(f"错误：目录不存在 - {root_path}")
+            return False
+
+        root_path = os.path.abspath(root_path)
+        if root_path != self.root_path:
+            self.root_path = root_path
+            self.scan_manifest = self._load_manifest(root_path)
+        previous_manifest = self.scan_manifest
+        manifest = {}
+        scan_started_ns = time.time_ns()
+
+        # 先按目录顺序收集 课程/班级，每个班级作为一个独立任务
+        tasks = []
+        remaining = {}  # 课程名 -> 尚未解析完成的班级数
+        for course_entry in self._scan_subdirs(root_path):
+            self.add_course(course_entry.name)
+            remaining[course_entry.name] = 0
+            for class_entry in self._scan_subdirs(course_entry.path):
+                tasks.append((course_entry.name, class_entry.name, class_entry.path))
+                remaining[course_entry.name] += 1
+
+        def scan(task):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            return self._scan_class(*task, previous_manifest, manifest, scan_started_ns, fact_writer)
+
+        pending_courses = list(remaining)
+
+        def complete_courses():
+            # 按目录顺序通知已经全部解析完成的课程
+            while pending_courses and remaining[pending_courses[0]] == 0:
+                course_name = pending_courses.pop(0)
+                self._update_missing_experiments(self.courses[course_name])
+                if course_callback:
+                    course_callback(course_name)
+
+        executor = None
+        if self.max_workers == 1 or len(tasks) <= 1:
+            results = map(scan, tasks)
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            results = executor.map(scan, tasks)
+
+        try:
+            complete_courses()
+            # 按原目录顺序写回，保证结果与串行遍历一致
+            for done, ((course_name, class_name, _), result) in enumerate(zip(tasks, results), 1):
+                if result is None:
+                    break
+                class_obj, diagnostics = result
+                self.courses[course_name].classes[class_name] = class_obj
+                self.diagnostics.extend(diagnostics)
+                remaining[course_name] -= 1
+                if progress_callback:
+                    progress_callback(done, len(tasks), f"{course_name}/{class_name}")
+                complete_courses()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        if cancel_event is not None and cancel_event.is_set():
+            self.courses = {}
+            self.logger.log(f"目录解析已取消 - {root_path}")
+            return False
+
+        self.scan_manifest = manifest
+        self._save_manifest()
+        self.generation += 1
+        self._save_store()
+        self.pattern_stats = Counter(match[3] for entry in manifest.values() for match in entry['matches'].values())
+        for pattern_name, count in self.pattern_stats.most_common():
+            self.logger.info(f"命名规则 {pattern_name}: 匹配 {count} 个文件")
+        for row in self.diagnostics.summary('kind'):
+            self.logger.warning(f"{row['label']}: {row['count']} 个文件")
+        return True
+
+    def refresh_paths(self, paths):
+        # 只重新扫描发生变化的目录（由监视器提供的路径），返回更新过的 [(课程名, 班级名)]
+        # 课程/班级目录本身变化时重新列出其下级目录，其余实验目录的文件列表沿用扫描清单
+        if self.root_path is None:
+            return []
+
+        dirty_keys = set()  # "课程/班级/实验"，需要重新列出文件
+        class_keys = set()  # (课程名, 班级名)
+        course_names = set()
+        for path in paths:
+            relative = os.path.relpath(os.path.abspath(path), self.root_path)
+            if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+                continue
+            parts = [] if relative == os.curdir else relative.split(os.sep)
+            if len(parts) >= 3:
+                dirty_keys.add('/'.join(parts[:3]))
+                class_keys.add((parts[0], parts[1]))
+            elif len(parts) == 2:
+                class_keys.add((parts[0], parts[1]))
+            elif len(parts) == 1:
+                course_names.add(parts[0])
+            else:
+                # 根目录变化只影响新增或删除的课程
+                course_names.update(set(self.courses) ^ {entry.name for entry in self._scan_subdirs(self.root_path)})
+
+        for course_name in course_names:
+            course_path = os.path.join(self.root_path, course_name)
+            if not os.path.isdir(course_path):
+                course = self.courses.pop(course_name, None)
+                class_keys.update((course_name, class_name) for class_name in (course.classes if course else ()))
+                continue
+            # 同样只需处理新增或删除的班级
+            class_names = set(self.add_course(course_name).classes)
+            class_names ^= {entry.name for entry in self._scan_subdirs(course_path)}
+            class_keys.update((course_name, class_name) for class_name in class_names)
+
+        scan_started_ns = time.time_ns()
+        refreshed = []
+        for course_name, class_name in sorted(class_keys):
+            prefix = f"{course_name}/{class_name}/"
+            previous_manifest = {key: entry for key, entry in self.scan_manifest.items()
+                                 if key.startswith(prefix) and key not in dirty_keys}
+            for key in [key for key in self.scan_manifest if key.startswith(prefix)]:
+                del self.scan_manifest[key]
+
+            class_path = os.path.join(self.root_path, course_name, class_name)
+            if os.path.isdir(class_path):
+                class_obj, diagnostics = self._scan_class(course_name, class_name, class_path, previous_manifest,
+                                                          self.scan_manifest, scan_started_ns)
+                self.add_course(course_name).classes[class_name] = class_obj
+                self._index_missing(course_name, class_obj)
+            else:
+                course = self.courses.get(course_name)
+                if course:
+                    course.classes.pop(class_name, None)
+                self.missing_index.pop((course_name, class_name), None)
+                diagnostics = ()
+            self.diagnostics.replace_class(course_name, class_name, diagnostics)
+            refreshed.append((course_name, class_name))
+
+        if refreshed:
+            self._rebuild_missing_experiments()
+            self.pattern_stats = Counter(match[3] for entry in self.scan_manifest.values()
+                                         for match in entry['matches'].values())
+            self.generation += 1
+            self._save_store(refreshed)
+            self.logger.debug(f"增量刷新 {len(refreshed)} 个班级，重新列出 {len(dirty_keys)} 个实验目录")
+        return refreshed
+
+    def _save_store(self, class_keys=None):
+        # 写入失败不影响内存中的解析结果，之后的统计回到内存计算
+        if self.store is None:
+            return
+        try:
+            self.store.save(self, class_keys)
+        except Exception as e:
+            self.logger.warning(f"保存到数据库失败: {str(e)}")
+
+    def _rebuild_missing_experiments(self):
+        # 按课程顺序重新汇总每个学生跨课程的缺交实验
+        for student in self.student_manager.get_all_students():
+            student.missing_experiments = []
+        for course in self.courses.values():
+            for class_obj in course.classes.values():
+                missing_by_student = self.get_missing_experiments(course.name, class_obj.name)
+                for student in self._get_matrix(class_obj).students:
+                    student.missing_experiments.extend(missing_by_student[student.student_id])
+
+    @staticmethod
+    def _scan_subdirs(path):
+        # DirEntry 自带文件类型信息，避免对每个条目再调用一次 os.path.isdir
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if entry.is_dir()]
+
+    def _scan_class(self, course_name, class_name, class_path, previous_manifest, manifest, scan_started_ns,
+                    fact_writer=None):
+        # 返回 (Class对象, 该班级的诊断记录列表)
+        class_obj = Class(class_name)
+        diagnostics = []
+        submitted_files = {}  # 实验名 -> [(学号, 文件路径)]
+        patterns = self.patterns.patterns_for(course_name)
+        signature = self.patterns.signature(course_name)
+
+        # 先建立全部实验及其目录编号，改计入其它实验时目标实验可能排在后面
+        experiment_entries = self._scan_subdirs(class_path)
+        for experiment_entry in experiment_entries:
+            experiment = class_obj.add_experiment(experiment_entry.name)
+            submitted_files[experiment.name] = []
+        experiments_by_number = self._experiments_by_number(class_obj)
+
+        for experiment_entry in experiment_entries:
+            experiment = class_obj.experiments[experiment_entry.name]
+            key = f"{course_name}/{class_name}/{experiment_entry.name}"
+            mtime_ns = experiment_entry.stat().st_mtime_ns
+
+            # 目录 mtime 和命名规则都未变化时直接复用上次的文件列表和匹配结果，不再列目录
+            entry = previous_manifest.get(key)
+            if (not entry or entry.get('racy') or entry['mtime_ns'] != mtime_ns
+                    or entry.get('patterns') != signature):
+                entry = self._list_experiment_files(experiment_entry.path, patterns)
+                entry['mtime_ns'] = mtime_ns
+                entry['patterns'] = signature
+                if scan_started_ns - mtime_ns < self.RACY_WINDOW_NS:
+                    entry['racy'] = True
+            manifest[key] = entry
+
+            submissions = self._apply_experiment_files(entry, course_name, class_name, experiment, diagnostics,
+                                                       experiments_by_number)
+            for experiment_name, student_id, filename in submissions:
+                submitted_files[experiment_name].append((student_id, os.path.join(experiment_entry.path, filename)))
+
+        matrix = self._build_matrix(class_obj)
+        if fact_writer is not None:
+            for experiment_name, submissions in submitted_files.items():
+                fact_writer.write_rows(self._fact_rows(course_name, class_name, experiment_name, submissions,
+                                                       matrix.get_missing_students(experiment_name)))
+        return class_obj, diagnostics
+
+    @classmethod
+    def _experiment_number(cls, experiment_name):
+        # 实验目录名中的第一个数字，如 "实验05" -> 5；没有数字时返回 None，不做编号校验
+        match = cls.EXPERIMENT_NUMBER.search(experiment_name)
+        return int(match.group()) if match else None
+
+    @classmethod
+    def _experiments_by_number(cls, class_obj):
+        # 同班级 {目录编号: Experiment}，编号重复时取先出现的目录
+        experiments_by_number = {}
+        for experiment in class_obj.experiments.values():
+            number = cls._experiment_number(experiment.name)
+            if number is not None:
+                experiments_by_number.setdefault(number, experiment)
+        return experiments_by_number
+
+    def _submission_target(self, experiment, experiment_number, experiment_num, experiments_by_number):
+        # 返回 (文件计入的 Experiment, 实验编号是否与目录不符)，按 reject 策略丢弃时 Experiment 为 None
+        # 自定义规则的 experiment 分组可能不是纯数字，此时不做编号校验
+        if experiment_number is None or not experiment_num.isdecimal():
+            return experiment, False
+        file_number = int(experiment_num)
+        if file_number == experiment_number:
+            return experiment, False
+        if self.experiment_mismatch == 'reject':
+            return None, True
+        if self.experiment_mismatch == 'reassign':
+            return experiments_by_number.get(file_number, experiment), True
+        return experiment, True
+
+    @staticmethod
+    def _fact_rows(course_name, class_name, experiment_name, submissions, missing_students):
+        # 已提交的学生每个文件一行（带路径、大小、修改时间），名单中未提交的学生各一行
+        rows = []
+        for student_id, path in submissions:
+            try:
+                stat = os.stat(path)
+                size, mtime = stat.st_size, datetime.datetime.fromtimestamp(stat.st_mtime)
+            except OSError:
+                size = mtime = None
+            rows.append([course_name, class_name, experiment_name, student_id, True, path, size, mtime])
+        for student in missing_students:
+            rows.append([course_name, class_name, experiment_name, student.student_id, False, None, None, None])
+        return rows
+
+    def _build_matrix(self, class_obj):
+        class_obj.matrix = SubmissionMatrix(self.student_manager.get_students_by_class(class_obj.name),
+                                            class_obj.experiments.values(),
+                                            self.student_manager.version)
+        return class_obj.matrix
+
+    def _get_matrix(self, class_obj):
+        # 名单在解析后被重新导入时重建矩阵
+        matrix = class_obj.matrix
+        if matrix is None or matrix.roster_version != self.student_manager.version:
+            matrix = self._build_matrix(class_obj)
+        return matrix
+
+    def add_course(self, course_name):
+        if course_name not in self.courses:
+            self.courses[course_name] = Course(course_name)
+        return self.courses[course_name]
+
+    @staticmethod
+    def _list_experiment_files(experiment_path, patterns=DEFAULT_PATTERNS):
+        # matches: 文件名 -> [实验编号, 学号, 姓名, 规则名]
+        with os.scandir(experiment_path) as entries:
+            filenames = [entry.name for entry in entries if entry.is_file()]
+        return {'files': filenames, 'matches': match_filenames(patterns, filenames)}
+
+    def _apply_experiment_files(self, entry, course_name, class_name, experiment, diagnostics,
+                                experiments_by_number=None):
+        # 返回计入提交的 [(计入的实验名, 学号, 文件名)]
+        # experiments_by_number：同班级 {目录编号: Experiment}，用于校验文件名中的实验编号
+        matches = entry['matches']
+        submissions = []
+        experiment_number = self._experiment_number(experiment.name) if experiments_by_number is not None else None
+        for filename in entry['files']:
+            match = matches.get(filename)
+            if not match:
+                diagnostics.append(Diagnostic(Diagnostic.BAD_FILENAME, course_name, class_name,
+                                              experiment.name, filename))
+                continue
+
+            experiment_num, student_id, student_name, _ = match
+
+            # 验证学生是否存在
+            student = self.student_manager.get_student(student_id)
+            if not student:
+                diagnostics.append(Diagnostic(Diagnostic.UNKNOWN_STUDENT, course_name, class_name,
+                                              experiment.name, filename, student_id, student_name))
+                continue
+
+            # 检查学生姓名是否匹配
+            if student.name != student_name:
+                diagnostics.append(Diagnostic(Diagnostic.NAME_MISMATCH, course_name, class_name,
+                                              experiment.name, filename, student_id, student_name, student.name))
+
+            target, mismatched = self._submission_target(experiment, experiment_number, experiment_num,
+                                                         experiments_by_number)
+            if mismatched:
+                diagnostics.append(Diagnostic(Diagnostic.EXPERIMENT_MISMATCH, course_name, class_name,
+                                              experiment.name, filename, student_id, student_name,
+                                              file_experiment=experiment_num))
+            if target is None:
+                continue
+
+            target.add_submitted_student(student_id)
+            submissions.append((target.name, student_id, filename))
+        return submissions
+
+    def _manifest_path(self, root_path):
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha1(root_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"scan_{digest}.json")
+
+    def _load_manifest(self, root_path):
+        manifest_path = self._manifest_path(root_path)
+        if not manifest_path or not os.path.exists(manifest_path):
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取扫描缓存失败: {str(e)}")
+            return {}
+        if data.get('version') != MANIFEST_VERSION or data.get('root') != root_path:
+            return {}
+        return data.get('experiments', {})
+
+    def _save_manifest(self):
+        manifest_path = self._manifest_path(self.root_path)
+        if not manifest_path:
+            return
+        data = {'version': MANIFEST_VERSION, 'root': self.root_path, 'experiments': self.scan_manifest}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, manifest_path)
+        except OSError as e:
+            self.logger.warning(f"保存扫描缓存失败: {str(e)}")
+
+    def _update_missing_experiments(self, course):
+        # 为课程下每个班级重建缺交索引，Student.missing_experiments 保留跨课程的汇总
+        for class_obj in course.classes.values():
+            missing_by_student = self._index_missing(course.name, class_obj)
+            for student in self._get_matrix(class_obj).students:
+                student.missing_experiments.extend(missing_by_student[student.student_id])
+
+    def _index_missing(self, course_name, class_obj):
+        matrix = self._get_matrix(class_obj)
+        missing_by_student = {student.student_id: [] for student in matrix.students}
+        for experiment_name in class_obj.experiments:
+            for student in matrix.get_missing_students(experiment_name):
+                missing_by_student[student.student_id].append(experiment_name)
+        self.missing_index[(course_name, class_obj.name)] = (matrix, missing_by_student)
+        return missing_by_student
+
+    def get_missing_experiments(self, course_name, class_name):
+        # 返回 {学号: [缺交实验名]}，只统计指定课程下该班级的实验
+        course = self.courses.get(course_name)
+        class_obj = course.get_class(class_name) if course else None
+        if not class_obj:
+            return {}
+
+        entry = self.missing_index.get((course_name, class_name))
+        if entry is None or entry[0] is not self._get_matrix(class_obj):
+            return self._index_missing(course_name, class_obj)
+        return entry[1]
+
+    def get_course_names(self):
+        return list(self.courses.keys())
+
+    def get_class_names(self, course_name):
+        course = self.courses.get(course_name)
+        if course:
+            return list(course.classes.keys())
+        return []
+
+    def iter_matched_files(self):
+        # 逐个给出最近一次解析中计入提交的文件：(课程名, 班级名, 计入的实验名, 学号, 文件路径)
+        # 与 _apply_experiment_files 的取舍一致：名单外学生的文件和按 reject 策略丢弃的文件不给出，
+        # reassign 策略下给出改计入的实验
+        for course_name, course in self.courses.items():
+            for class_name, class_obj in course.classes.items():
+                experiments_by_number = self._experiments_by_number(class_obj)
+                for experiment in class_obj.experiments.values():
+                    entry = self.scan_manifest.get(f"{course_name}/{class_name}/{experiment.name}")
+                    if not entry:
+                        continue
+                    experiment_number = self._experiment_number(experiment.name)
+                    experiment_path = os.path.join(self.root_path, course_name, class_name, experiment.name)
+                    for filename, (experiment_num, student_id, _, _) in entry['matches'].items():
+                        if not self.student_manager.get_student(student_id):
+                            continue
+                        target, _ = self._submission_target(experiment, experiment_number, experiment_num,
+                                                            experiments_by_number)
+                        if target is not None:
+                            yield (course_name, class_name, target.name, student_id,
+                                   os.path.join(experiment_path, filename))
+
+    def _cached_stats(self, kind, course_name, class_name, compute):
+        # 同一解析代数、同一份名单下统计结果不变，切换回已查看过的班级时直接复用
+        cache_key = (self.generation, self.student_manager.version)
+        if self.stats_cache_key != cache_key:
+            self.stats_cache = {}
+            self.stats_cache_key = cache_key
+
+        key = (kind, course_name, class_name)
+        result = self.stats_cache.get(key)
+        if result is None:
+            result = compute(course_name, class_name)
+            self.stats_cache[key] = result
+        return result
+
+    def _store_current(self):
+        # 数据库内容与当前解析结果、名单一致时统计改由数据库查询
+        return self.store is not None and self.store.is_current(self)
+
+    def get_student_stats(self, course_name, class_name):
+        compute = self.store.student_stats if self._store_current() else self._compute_student_stats
+        return self._cached_stats('student', course_name, class_name, compute)
+
+    def get_experiment_stats(self, course_name, class_name):
+        compute = self.store.experiment_stats if self._store_current() else self._compute_experiment_stats
+        return self._cached_stats('experiment', course_name, class_name, compute)
+
+    def get_submission_rates(self, course_name, class_name):
+        compute = self.store.submission_rates if self._store_current() else self._compute_submission_rates
+        return self._cached_stats('rates', course_name, class_name, compute)
+
+    def _compute_student_stats(self, course_name, class_name):
+        course = self.courses.get(course_name)
+        if not course:
+            return []
+
+        class_obj = course.get_class(class_name)
+        if not class_obj:
+            return []
+
+        students = self._get_matrix(class_obj).students
+        missing_by_student = self.get_missing_experiments(course_name, class_name)
+        stats = []
+
+        for student in students:
+            missing_experiments = missing_by_student[student.student_id]
+            stats.append({
+                'student_id': student.student_id,
+                'name': student.name,
+                'grade': student.grade,  # 新增年级
+                'class_name': student.class_name,  # 新增班级
+                'missing_count': len(missing_experiments),
+                'missing_list': ", ".join(missing_experiments)
+            })
+
+        return stats
+
+    def _compute_experiment_stats(self, course_name, class_name):
+        course = self.courses.get(course_name)
+        if not course:
+            return []
+
+        class_obj = course.get_class(class_name)
+        if not class_obj:
+            return []
+
+        matrix = self._get_matrix(class_obj)
+        stats = []
+
+        for experiment_name in class_obj.experiments:
+            missing_names = [f"{student.name}({student.student_id})"
+                             for student in matrix.get_missing_students(experiment_name)]
+
+            stats.append({
+                'experiment_name': experiment_name,
+                'submission_rate': matrix.get_submission_rate(experiment_name),
+                'missing_students': ", ".join(missing_names)
+            })
+
+        return stats
+
+    def _compute_submission_rates(self, course_name, class_name):
+        course = self.courses.get(course_name)
+        if not course:
+            return [], []
+
+        class_obj = course.get_class(class_name)
+        if not class_obj:
+            return [], []
+
+        experiments = sorted(class_obj.experiments.values(),
+                             key=lambda exp: int(re.search(r'\d+', exp.name).group()) if re.search(r'\d+',
+                                                                                                   exp.name) else 0)
+
+        matrix = self._get_matrix(class_obj)
+        names = [exp.name for exp in experiments]
+        rates = [matrix.get_submission_rate(exp.name) for exp in experiments]
+
+        return names, rates
+
+    def get_aggregate_stats(self, top_n=20):
+        # 汇总结果每个解析代数只计算、缓存一份，不同的 top_n 只截取缺交排名的前几名
+        summary = self._cached_stats('aggregate', None, None, lambda *_: self._compute_aggregate_stats())
+        return dict(summary, chronic=summary['chronic'][:top_n])
+
+    def _compute_aggregate_stats(self):
+        # 一次遍历所有课程/班级的提交矩阵，得到跨班级、跨课程的汇总：
+        # courses 按课程、grades 按年级的提交率（只计名单内学生），
+        # experiments 同一课程同名实验在各班级间的提交率分布，chronic 按缺交次数排名的全部缺交学生
+        courses = []
+        grades = {}  # 年级 -> [学号集合, 已提交数, 应提交数]
+        experiments = {}  # (课程名, 实验名) -> [(班级名, 提交率)]
+        chronic = {}  # 学号 -> [缺交次数, 应提交数, ["课程/实验"]]
+
+        for course_name, course in self.courses.items():
+            submitted_total = expected_total = students_total = experiment_total = 0
+            for class_name, class_obj in course.classes.items():
+                matrix = self._get_matrix(class_obj)
+                class_size = len(matrix.students)
+                experiment_count = len(class_obj.experiments)
+                students_total += class_size
+                experiment_total += experiment_count
+
+                for experiment_name in class_obj.experiments:
+                    submitted_total += matrix.get_roster_submitted_count(experiment_name)
+                    experiments.setdefault((course_name, experiment_name), []).append(
+                        (class_name, matrix.get_submission_rate(experiment_name)))
+                expected_total += class_size * experiment_count
+
+                for student in matrix.students:
+                    grades.setdefault(student.grade, [set(), 0, 0])[0].add(student.student_id)
+                for grade, grade_mask in matrix.grade_masks.items():
+                    entry = grades[grade]
+                    entry[1] += sum(matrix.get_roster_submitted_count(name, grade_mask)
+                                    for name in class_obj.experiments)
+                    entry[2] += grade_mask.bit_count() * experiment_count
+
+                for student_id, missing in self.get_missing_experiments(course_name, class_name).items():
+                    entry = chronic.setdefault(student_id, [0, 0, []])
+                    entry[0] += len(missing)
+                    entry[1] += experiment_count
+                    entry[2].extend(f"{course_name}/{name}" for name in missing)
+
+            courses.append({
+                'course': course_name,
+                'classes': len(course.classes),
+                'students': students_total,
+                'experiments': experiment_total,
+                'submitted': submitted_total,
+                'expected': expected_total,
+                'submission_rate': submitted_total / expected_total * 100 if expected_total else 0,
+            })
+
+        grade_rows = [{
+            'grade': grade,
+            'students': len(student_ids),
+            'submitted': submitted,
+            'expected': expected,
+            'submission_rate': submitted / expected * 100 if expected else 0,
+        } for grade, (student_ids, submitted, expected) in sorted(grades.items())]
+
+        experiment_rows = []
+        for (course_name, experiment_name), class_rates in experiments.items():
+            rates = sorted(rate for _, rate in class_rates)
+            experiment_rows.append({
+                'course': course_name,
+                'experiment_name': experiment_name,
+                'classes': len(rates),
+                'min_rate': rates[0],
+                'median_rate': statistics.median(rates),
+                'mean_rate': sum(rates) / len(rates),
+                'max_rate': rates[-1],
+                'class_rates': ", ".join(f"{name}: {rate:.1f}%" for name, rate in class_rates),
+            })
+
+        chronic_rows = []
+        ranked = sorted((item for item in chronic.items() if item[1][0] > 0),
+                        key=lambda item: (-item[1][0], -item[1][0] / item[1][1], item[0]))
+        for student_id, (missing_count, expected, missing) in ranked:
+            student = self.student_manager.get_student(student_id)
+            chronic_rows.append({
+                'student_id': student_id,
+                'name': student.name if student else "",
+                'grade': student.grade if student else "",
+                'class_name': student.class_name if student else "",
+                'missing_count': missing_count,
+                'expected': expected,
+                'missing_rate': missing_count / expected * 100,
+                'missing_list': ", ".join(missing),
+            })
+
+        return {'courses': courses, 'grades': grade_rows, 'experiments': experiment_rows, 'chronic': chronic_rows}
+
+
+ROSTER_COLUMNS = ('学号', '姓名', '年级', '班级')
+IMPORT_CHUNK_SIZE = 2000  # 导入名单时每批添加的行数，也是进度回调和取消检查的粒度
+
+
+def _roster_positions(header):
+    # 表头中各名单列的位置，缺失的列为 None
+    names = [str(name).strip() if name is not None else '' for name in header]
+    return [names.index(column) if column in names else None for column in ROSTER_COLUMNS]
+
+
+def _cell_text(value):
+    # 单元格统一转为去除首尾空白的字符串：空值为 ''，整数值的浮点数（如 2021001.0）去掉小数部分
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+class StudentManager:
+    def __init__(self):
+        self.students = {}  # 学号 -> Student对象
+        self.classes = {}  # 班级名 -> [Student对象]
+        self.logger = Logger()
+        self.version = 0  # 名单每次变化时递增，用于判断提交矩阵是否过期
+
+    def add_student(self, student_id, name, grade="", class_name=""):
+        if student_id in self.students:
+            self.logger.warning(f"警告：重复添加学生 {name}({student_id})")
+            return
+
+        student = Student(student_id, name, grade, class_name)  # 传递年级和班级
+        self.students[student_id] = student
+        self.version += 1
+
+        if class_name:
+            if class_name not in self.classes:
+                self.classes[class_name] = []
+            self.classes[class_name].append(student)
+
+    def add_students(self, rows):
+        # 批量添加 (学号, 姓名, 年级, 班级)，返回实际新增的学号列表
+        students = self.students
+        classes = self.classes
+        added = []
+        for student_id, name, grade, class_name in rows:
+            if student_id in students:
+                self.logger.warning(f"警告：重复添加学生 {name}({student_id})")
+                continue
+
+            student = Student(student_id, name, grade, class_name)
+            students[student_id] = student
+            if class_name:
+                classes.setdefault(class_name, []).append(student)
+            added.append(student_id)
+
+        if added:
+            self.version += 1
+        return added
+
+    def import_from_excel(self, file_path, progress_callback=None, cancel_event=None):
+        # 支持 .xlsx/.xls/.csv，只读取 学号/姓名/年级/班级 四列
+        # progress_callback(已处理行数, 总行数)，总行数未知时为 0；cancel_event 置位时撤销本次已导入的学生并返回 False
+        added = []
+        try:
+            rows, total = self._read_roster(file_path)
+            done = 0
+            for chunk in self._chunk_rows(rows, IMPORT_CHUNK_SIZE):
+                if cancel_event is not None and cancel_event.is_set():
+                    self._remove_students(added)
+                    self.logger.log(f"已取消导入: {file_path}")
+                    return False
+
+                done += len(chunk)
+                added.extend(self.add_students(
+                    [row for row in chunk if row[0] and row[1]]))  # 学号和姓名都不能为空
+                if progress_callback:
+                    progress_callback(done, total)
+
+            self.logger.log(f"成功导入名单 {done} 行: {os.path.basename(file_path)}")
+            return True
+        except Exception as e:
+            self.logger.error(f"导入名单失败: {str(e)}")
+            return False
+
+    def _read_roster(self, file_path):
+        # 返回 (行迭代器, 总行数)，每行为已规整的 (学号, 姓名, 年级, 班级) 字符串
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.csv':
+            return self._read_roster_csv(file_path), 0
+        if extension in ('.xlsx', '.xlsm'):
+            try:
+                import openpyxl
+            except ImportError:
+                openpyxl = None
+            if openpyxl is not None:
+                return self._read_roster_openpyxl(openpyxl, file_path)
+        return self._read_roster_pandas(file_path)
+
+    @staticmethod
+    def _read_roster_csv(file_path):
+        # utf-8-sig 兼容 Excel 另存的带 BOM 的 CSV
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            positions = _roster_positions(next(reader, []))
+            for row in reader:
+                yield tuple(_cell_text(row[i]) if i is not None and i < len(row) else ''
+                            for i in positions)
+
+    @staticmethod
+    def _read_roster_openpyxl(openpyxl, file_path):
+        # 只读模式逐行流式读取，不把整个工作簿载入内存
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        sheet = workbook.worksheets[0]
+        total = max((sheet.max_row or 1) - 1, 0)
+
+        def rows():
+            try:
+                cells = sheet.iter_rows(values_only=True)
+                positions = _roster_positions(next(cells, ()))
+                for row in cells:
+                    yield tuple(_cell_text(row[i]) if i is not None and i < len(row) else ''
+                                for i in positions)
+            finally:
+                workbook.close()
+
+        return rows(), total
+
+    @staticmethod
+    def _read_roster_pandas(file_path):
+        import pandas as pd  # 延迟导入，只有 .xls 或未安装 openpyxl 时才需要 pandas
+
+        df = pd.read_excel(file_path, usecols=lambda column: str(column).strip() in ROSTER_COLUMNS,
+                           dtype=object)
+        df.columns = [str(column).strip() for column in df.columns]
+        # 按列整体规整，缺失的列视为空字符串
+        columns = []
+        for column in ROSTER_COLUMNS:
+            if column in df.columns:
+                columns.append(df[column].map(_cell_text).tolist())
+            else:
+                columns.append([''] * len(df))
+        return zip(*columns), len(df)
+
+    @staticmethod
+    def _chunk_rows(rows, size):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _remove_students(self, student_ids):
+        removed = {student_id for student_id in student_ids if student_id in self.students}
+        if not removed:
+            return
+        self.version += 1
+        class_names = {self.students.pop(student_id).class_name for student_id in removed}
+        for class_name in class_names:
+            remaining = [student for student in self.classes.get(class_name, [])
+                         if student.student_id not in removed]
+            if remaining:
+                self.classes[class_name] = remaining
+            else:
+                self.classes.pop(class_name, None)
+
+    def get_student(self, student_id):
+        return self.students.get(student_id)
+
+    def get_students_by_class(self, class_name):
+        return self.classes.get(class_name, [])
+
+    def get_all_students(self):
+        return list(self.students.values())
+
+    def clear_students(self):
+        self.students = {}
+        self.classes = {}
+        self.version += 1
+
+    def replace_students(self, other):
+        # 用另一个 StudentManager 中导入完成的名单整体替换当前名单，版本号继续递增使缓存失效
+        self.students = other.students
+        self.classes = other.classes
+        self.version = max(self.version, other.version) + 1
+
+
+class ConsoleSink:
+    def write_batch(self, lines):
+        # 一批日志合并为一次写入，避免逐条 print
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+    def close(self):
+        pass
+
+
+class RotatingFileSink:
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.file = None
+
+    def write_batch(self, lines):
+        if self.file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        # log -> log.1 -> log.2 ...，超出 backup_count 的最旧文件被覆盖
+        self.file.close()
+        self.file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Logger:
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+    LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+    MAX_ENTRIES = 10000  # 内存中最多保留的日志条数，超出后丢弃最旧的
+    BATCH_SIZE = 500  # 后台线程每次最多合并写出的条数
+    MAX_QUEUED = 10000  # 等待写出的最大条数，输出过慢时超出的日志不写出，只在内存中保留并计数
+
+    _instance = None
+
+    def __new__(cls):
+        if not cls._instance:
+            cls._instance = super().__new__(cls)
+            cls._instance.entries = deque(maxlen=cls.MAX_ENTRIES)  # (序号, 时间, 级别, 消息)
+            cls._instance.sequence = 0
+            cls._instance.level = cls.INFO
+            cls._instance.sinks = [ConsoleSink()]  # 默认同时输出到控制台
+            cls._instance.lock = threading.Lock()
+            cls._instance.queue = queue.Queue(maxsize=cls.MAX_QUEUED)
+            cls._instance.dropped = 0  # 因队列已满未写出的条数
+            cls._instance.writer = None
+        return cls._instance
+
+    def log(self, message, level=INFO):
+        if level < self.level:
+            return
+        with self.lock:
+            self.sequence += 1
+            entry = (self.sequence, time.time(), level, message)
+            self.entries.append(entry)
+            if self.sinks:
+                self._start_writer()
+                try:
+                    self.queue.put_nowait(entry)
+                except queue.Full:
+                    self.dropped += 1
+
+    def debug(self, message):
+        self.log(message, self.DEBUG)
+
+    def info(self, message):
+        self.log(message, self.INFO)
+
+    def warning(self, message):
+        self.log(message, self.WARNING)
+
+    def error(self, message):
+        self.log(message, self.ERROR)
+
+    def set_level(self, level):
+        self.level = level
+
+    def add_sink(self, sink):
+        self.flush()
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.flush()
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+            sink.close()
+
+    @classmethod
+    def format_entry(cls, entry):
+        _, created, level, message = entry
+        timestamp = datetime.datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+        return f"[{timestamp}] [{cls.LEVEL_NAMES.get(level, level)}] {message}"
+
+    def get_logs(self):
+        return [self.format_entry(entry) for entry in list(self.entries)]
+
+    def get_logs_since(self, sequence):
+        # 返回 (最新序号, 序号大于 sequence 的格式化日志)，用于界面增量追加
+        entries = list(self.entries)
+        new_entries = []
+        for entry in reversed(entries):
+            if entry[0] <= sequence:
+                break
+            new_entries.append(entry)
+        new_entries.reverse()
+        latest = entries[-1][0] if entries else sequence
+        return latest, [self.format_entry(entry) for entry in new_entries]
+
+    def clear_logs(self):
+        with self.lock:
+            self.entries.clear()
+
+    def flush(self):
+        # 等待后台线程把已记录的日志全部写出
+        if self.writer is not None:
+            self.queue.join()
+
+    def _start_writer(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, name="erat-logger", daemon=True)
+            self.writer.start()
+            atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = [self.format_entry(entry) for entry in batch]
+            with self.lock:
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                lines.append(self.format_entry((0, time.time(), self.WARNING,
+                                                f"日志输出过慢，已有 {dropped} 条日志未写出")))
+            for sink in list(self.sinks):
+                try:
+                    sink.write_batch(lines)
+                except Exception:
+                    pass  # 日志输出失败不能影响主流程
+            for _ in batch:
+                self.queue.task_done()
+
+
+STUDENT_STATS_COLUMNS = ('student_id', 'name', 'grade', 'class_name', 'missing_count', 'missing_list')
+EXPERIMENT_STATS_COLUMNS = ('experiment_name', 'submission_rate', 'missing_students')
+REPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def _sheet_title(name, used):
+    # Excel 工作表名最长 31 个字符且不能包含 []:*?/\，重名时追加序号
+    base = INVALID_SHEET_CHARS.sub('_', name)[:31] or "Sheet"
+    title = base
+    suffix = 2
+    while title.lower() in used:
+        tail = f"~{suffix}"
+        title = base[:31 - len(tail)] + tail
+        suffix += 1
+    used.add(title.lower())
+    return title
+
+
+class _XlsxWriterWorkbook:
+    # xlsxwriter 常量内存模式：每行写完即落盘，内存占用与数据量无关
+    def __init__(self, xlsxwriter, file_path):
+        self.workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True})
+
+    def add_sheet(self, title, header):
+        sheet = self.workbook.add_worksheet(title)
+        sheet.write_row(0, 0, header)
+        row_index = [0]
+
+        def write_row(row):
+            row_index[0] += 1
+            sheet.write_row(row_index[0], 0, row)
+        return write_row
+
+    def close(self):
+        self.workbook.close()
+
+
+class _OpenpyxlWorkbook:
+    # 未安装 xlsxwriter 时使用 openpyxl 的只写模式，同样逐行流式写出
+    def __init__(self, openpyxl, file_path):
+        self.file_path = file_path
+        self.workbook = openpyxl.Workbook(write_only=True)
+
+    def add_sheet(self, title, header):
+        sheet = self.workbook.create_sheet(title)
+        sheet.append(list(header))
+        return lambda row: sheet.append(list(row))
+
+    def close(self):
+        self.workbook.save(self.file_path)
+
+
+def _open_workbook(file_path):
+    try:
+        import xlsxwriter
+        return _XlsxWriterWorkbook(xlsxwriter, file_path)
+    except ImportError:
+        import openpyxl
+        return _OpenpyxlWorkbook(openpyxl, file_path)
+
+
+class _TableWriter:
+    # 逐行写出的表格文件：csv 直接写入；parquet 按批缓冲后写出 row group，需要 pyarrow
+    # types 为各列的 pyarrow 类型名（如 'int64'），省略时由第一批数据推断
+    BATCH_ROWS = 10000
+
+    def __init__(self, file_path, columns, file_format, types=None):
+        self.columns = list(columns)
+        self.file_format = file_format
+        self.types = types
+        if file_format == 'csv':
+            self.file = open(file_path, 'w', encoding='utf-8-sig', newline='')
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(self.columns)
+        else:
+            import pyarrow.parquet as pq
+
+            self.file_path = file_path
+            self.pq = pq
+            self.parquet_writer = None
+            self.batch = []
+
+    def write(self, row):
+        if self.file_format == 'csv':
+            self.csv_writer.writerow(row)
+        else:
+            self.batch.append(row)
+            if len(self.batch) >= self.BATCH_ROWS:
+                self._flush_batch()
+
+    def _flush_batch(self):
+        import pyarrow as pa
+
+        rows = [dict(zip(self.columns, row)) for row in self.batch]
+        if self.parquet_writer is not None:
+            # 后续批次沿用第一批推断出的类型（如整数 0 转为浮点数的提交率）
+            table = pa.Table.from_pylist(rows, schema=self.parquet_writer.schema)
+        elif self.types:
+            schema = pa.schema([(column, pa.type_for_alias(type_name))
+                                for column, type_name in zip(self.columns, self.types)])
+            table = pa.Table.from_pylist(rows, schema=schema)
+        elif rows:
+            table = pa.Table.from_pylist(rows)
+        else:
+            table = pa.table({column: pa.array([], pa.string()) for column in self.columns})
+        if self.parquet_writer is None:
+            self.parquet_writer = self.pq.ParquetWriter(self.file_path, table.schema)
+        self.parquet_writer.write_table(table)
+        self.batch = []
+
+    def close(self):
+        if self.file_format == 'csv':
+            self.file.close()
+            return
+        if self.batch or self.parquet_writer is None:
+            self._flush_batch()
+        self.parquet_writer.close()
+
+
+FACT_COLUMNS = ('course', 'class', 'experiment', 'student_id', 'submitted', 'path', 'size', 'mtime')
+FACT_TYPES = ('string', 'string', 'string', 'string', 'bool', 'string', 'int64', 'timestamp[us]')
+
+
+class FactTableWriter:
+    # 提交明细表：解析线程每完成一个班级写出一批行，写入时加锁；整张表不会同时保存在内存中
+    def __init__(self, file_path, file_format=None):
+        if file_format is None:
+            file_format = 'parquet' if file_path.lower().endswith('.parquet') else 'csv'
+        self.file_path = file_path
+        self.writer = _TableWriter(file_path, FACT_COLUMNS, file_format, FACT_TYPES)
+        self.lock = threading.Lock()
+        self.row_count = 0
+
+    def write_rows(self, rows):
+        with self.lock:
+            for row in rows:
+                self.writer.write(row)
+            self.row_count += len(rows)
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+
+
+class StatisticsExporter:
+    @staticmethod
+    def export_student_stats_to_excel(student_stats, file_path):
+        if not student_stats:
+            return False
+
+        import pandas as pd
+
+        # 导出包含年级和班级的学生统计数据
+        df = pd.DataFrame(student_stats)
+        try:
+            df.to_excel(file_path, index=False)
+            return True
+        except Exception as e:
+            Logger().error(f"导出学生统计数据失败: {str(e)}")
+            return False
+
+    @staticmethod
+    def export_experiment_stats_to_excel(experiment_stats, file_path):
+        if not experiment_stats:
+            return False
+
+        import pandas as pd
+
+        df = pd.DataFrame(experiment_stats)
+        try:
+            df.to_excel(file_path, index=False)
+            return True
+        except Exception as e:
+            Logger().error(f"导出实验统计数据失败: {str(e)}")
+            return False
+
+    @staticmethod
+    def _export_rows(columns, rows, file_path, error_label):
+        # .csv 用标准库逐行写出，其余格式交给 pandas；rows 为与 columns 对应的行列表
+        try:
+            if file_path.lower().endswith('.csv'):
+                with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                    writer.writerows(rows)
+            else:
+                import pandas as pd
+
+                pd.DataFrame(rows, columns=columns).to_excel(file_path, index=False)
+            return True
+        except Exception as e:
+            Logger().error(f"导出{error_label}失败: {str(e)}")
+            return False
+
+    @staticmethod
+    def export_diagnostics(diagnostics, file_path):
+        # diagnostics 为 Diagnostic 列表
+        if not diagnostics:
+            return False
+
+        columns = ('label',) + Diagnostic.FIELDS + ('path',)
+        rows = [[row[column] for column in columns] for row in (diagnostic.to_dict() for diagnostic in diagnostics)]
+        return StatisticsExporter._export_rows(columns, rows, file_path, "解析诊断")
+
+    @staticmethod
+    def export_duplicates(groups, file_path):
+        # groups 为 erat_dedup.find_duplicates 的结果，每个文件一行，同组文件的 group 相同
+        if not groups:
+            return False
+
+        columns = ('group', 'label', 'course', 'experiment', 'class_name', 'student_id', 'size', 'digest', 'path')
+        rows = [[number, group['label'], group['course'], group['experiment'], class_name, student_id,
+                 group['size'], group['digest'], path]
+                for number, group in enumerate(groups, 1)
+                for class_name, student_id, path in group['files']]
+        return StatisticsExporter._export_rows(columns, rows, file_path, "查重结果")
+
+    @staticmethod
+    def export_similar_pairs(pairs, file_path):
+        # pairs 为 erat_similarity.find_similar 的结果，每对文件一行
+        if not pairs:
+            return False
+
+        columns = ('course', 'experiment', 'similarity', 'class_a', 'student_a', 'path_a',
+                   'class_b', 'student_b', 'path_b')
+        rows = [[pair['course'], pair['experiment'], round(pair['similarity'], 4), *pair['left'], *pair['right']]
+                for pair in pairs]
+        return StatisticsExporter._export_rows(columns, rows, file_path, "相似度检测结果")
+
+    @staticmethod
+    def export_term_report(directory_parser, output_dir, file_format='xlsx', progress_callback=None,
+                           cancel_event=None):
+        # 导出整个学期所有课程/班级的学生统计和实验统计，返回写出的文件列表（失败或被取消时返回空列表）
+        # xlsx：每门课程一个工作簿，每个班级两个工作表（学生、实验），所有工作表在一次写入会话中流式写出
+        # csv/parquet：学生统计和实验统计各一个长表，前两列为课程和班级，便于下游工具处理
+        if file_format not in REPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {file_format}")
+
+        tasks = [(course_name, class_name)
+                 for course_name in directory_parser.get_course_names()
+                 for class_name in directory_parser.get_class_names(course_name)]
+        os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            if file_format == 'xlsx':
+                files = StatisticsExporter._export_term_xlsx(directory_parser, output_dir, tasks, progress_callback,
+                                                             cancel_event)
+            else:
+                files = StatisticsExporter._export_term_tables(directory_parser, output_dir, tasks, file_format,
+                                                               progress_callback, cancel_event)
+        except Exception as e:
+            Logger().error(f"导出学期报表失败: {str(e)}")
+            return []
+
+        if cancel_event is not None and cancel_event.is_set():
+            Logger().warning(f"学期报表导出已取消，{output_dir} 中的文件可能不完整")
+            return []
+
+        Logger().info(f"导出学期报表: {len(files)} 个文件，{len(tasks)} 个班级 -> {output_dir}")
+        return files
+
+    @staticmethod
+    def _export_term_xlsx(directory_parser, output_dir, tasks, progress_callback, cancel_event):
+        files = []
+        workbook = None
+        current_course = None
+        used_titles = set()
+        try:
+            for done, (course_name, class_name) in enumerate(tasks, 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if course_name != current_course:
+                    if workbook is not None:
+                        workbook.close()
+                    file_path = os.path.join(output_dir, f"{course_name}_学期报表.xlsx")
+                    workbook = _open_workbook(file_path)
+                    files.append(file_path)
+                    current_course = course_name
+                    used_titles = set()
+
+                write_row = workbook.add_sheet(_sheet_title(f"{class_name}-学生", used_titles), STUDENT_STATS_COLUMNS)
+                for stat in directory_parser.get_student_stats(course_name, class_name):
+                    write_row([stat[column] for column in STUDENT_STATS_COLUMNS])
+
+                write_row = workbook.add_sheet(_sheet_title(f"{class_name}-实验", used_titles),
+                                               EXPERIMENT_STATS_COLUMNS)
+                for stat in directory_parser.get_experiment_stats(course_name, class_name):
+                    write_row([stat[column] for column in EXPERIMENT_STATS_COLUMNS])
+
+                if progress_callback:
+                    progress_callback(done, len(tasks), f"{course_name}/{class_name}")
+        finally:
+            if workbook is not None:
+                workbook.close()
+        return files
+
+    @staticmethod
+    def _export_term_tables(directory_parser, output_dir, tasks, file_format, progress_callback, cancel_event):
+        tables = [
+            ("学期报表_学生统计", STUDENT_STATS_COLUMNS, directory_parser.get_student_stats),
+            ("学期报表_实验统计", EXPERIMENT_STATS_COLUMNS, directory_parser.get_experiment_stats),
+        ]
+        files = []
+        writers = []
+        try:
+            for name, columns, _ in tables:
+                file_path = os.path.join(output_dir, f"{name}.{file_format}")
+                writers.append(_TableWriter(file_path, ('course', 'class') + columns, file_format))
+                files.append(file_path)
+
+            for done, (course_name, class_name) in enumerate(tasks, 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                for writer, (_, columns, get_stats) in zip(writers, tables):
+                    for stat in get_stats(course_name, class_name):
+                        writer.write([course_name, class_name] + [stat[column] for column in columns])
+                if progress_callback:
+                    progress_callback(done, len(tasks), f"{course_name}/{class_name}")
+        finally:
+            for writer in writers:
+                writer.close()
+        return files
@@ -0,0 +1,167 @@
+import os
+import json
+import mmap
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from erat_core import CACHE_DIR, Logger
+
+
+HASH_CHUNK_SIZE = 1 << 20  # 每次送入哈希的字节数
+POOL_MIN_FILES = 64  # 需要计算哈希的文件少于该数量时直接在本进程计算，省去启动进程池的开销
+HASH_CACHE_VERSION = 1
+
+COPY = 'copy'  # 不同学生提交了内容完全相同的文件
+RESUBMISSION = 'resubmission'  # 同一学生重复提交了相同内容
+KIND_LABELS = {COPY: "不同学生相同文件", RESUBMISSION: "重复提交"}
+
+
+def hash_file(path):
+    # 在子进程中执行：通过 mmap 分块计算 sha256，返回 (路径, 大小, mtime_ns, 摘要)，读取失败时摘要为 None
+    # 大小和 mtime 取自打开后的文件，保证缓存键与实际读到的内容一致
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            digest = hashlib.sha256()
+            if stat.st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(0, stat.st_size, HASH_CHUNK_SIZE):
+                            digest.update(view[offset:offset + HASH_CHUNK_SIZE])
+                    finally:
+                        view.release()
+            return path, stat.st_size, stat.st_mtime_ns, digest.hexdigest()
+    except (OSError, ValueError):
+        return path, None, None, None
+
+
+class HashCache:
+    # 文件路径 -> [大小, mtime_ns, 摘要]，大小和修改时间都未变化的文件不再读取
+    def __init__(self, root_path, cache_dir=CACHE_DIR):
+        self.entries = {}
+        self.path = None
+        if cache_dir:
+            digest = hashlib.sha1(root_path.encode('utf-8')).hexdigest()[:16]
+            self.path = os.path.join(cache_dir, f"hashes_{digest}.json")
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            Logger().warning(f"读取哈希缓存失败: {str(e)}")
+            return
+        if data.get('version') == HASH_CACHE_VERSION:
+            self.entries = data.get('files', {})
+
+    def get(self, path, size, mtime_ns):
+        entry = self.entries.get(path)
+        if entry and entry[0] == size and entry[1] == mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, path, size, mtime_ns, digest):
+        self.entries[path] = [size, mtime_ns, digest]
+
+    def save(self, keep_paths):
+        # 只保留 keep_paths 中的文件，避免缓存无限增长；查重和相似度检测共用同一缓存，
+        # 调用方应传入全部已匹配的文件而不是本次处理的子集，否则会互相清掉对方的条目
+        if not self.path:
+            return
+        self.entries = {path: entry for path, entry in self.entries.items() if path in keep_paths}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': HASH_CACHE_VERSION, 'files': self.entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            Logger().warning(f"保存哈希缓存失败: {str(e)}")
+
+
+def find_duplicates(directory_parser, max_workers=None, cache_dir=CACHE_DIR, progress_callback=None,
+                    cancel_event=None):
+    # 在同一课程的同一实验内（跨班级）查找内容完全相同的提交，返回重复组列表：
+    # {course, experiment, kind, label, digest, size, files: [(班级名, 学号, 文件路径)]}
+    # 只有大小相同的文件才可能重复，因此只对大小冲突的文件计算哈希；空文件内容必然相同，不算重复
+    logger = Logger()
+    candidates = defaultdict(list)  # (课程名, 实验名, 大小) -> [(班级名, 学号, 路径, mtime_ns)]
+    matched_paths = set()
+    empty = 0
+    for course_name, class_name, experiment_name, student_id, path in directory_parser.iter_matched_files():
+        matched_paths.add(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_size == 0:
+            empty += 1
+            continue
+        candidates[(course_name, experiment_name, stat.st_size)].append(
+            (class_name, student_id, path, stat.st_mtime_ns))
+    candidates = {key: files for key, files in candidates.items() if len(files) > 1}
+
+    cache = HashCache(directory_parser.root_path, cache_dir)
+    digests = {}  # 路径 -> 摘要
+    pending = []
+    for (_, _, size), files in candidates.items():
+        for _, _, path, mtime_ns in files:
+            digest = cache.get(path, size, mtime_ns)
+            if digest is None:
+                pending.append(path)
+            else:
+                digests[path] = digest
+
+    if pending:
+        executor = None
+        if len(pending) < POOL_MIN_FILES or max_workers == 1:
+            results = map(hash_file, pending)
+        else:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+            results = executor.map(hash_file, pending, chunksize=16)
+        try:
+            for done, (path, size, mtime_ns, digest) in enumerate(results, 1):
+                if digest is None:
+                    logger.warning(f"无法读取文件，跳过查重: {path}")
+                else:
+                    digests[path] = digest
+                    cache.put(path, size, mtime_ns, digest)
+                if progress_callback:
+                    progress_callback(done, len(pending), os.path.basename(path))
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.log("查重已取消")
+                    return []
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    cache.save(matched_paths)
+    logger.info(f"查重: {len(digests)} 个候选文件，其中 {len(pending)} 个重新计算哈希")
+    if empty:
+        logger.warning(f"空文件，未参与查重: {empty} 个")
+
+    groups = []
+    for (course_name, experiment_name, size), files in candidates.items():
+        by_digest = defaultdict(list)
+        for class_name, student_id, path, _ in files:
+            digest = digests.get(path)
+            if digest is not None:
+                by_digest[digest].append((class_name, student_id, path))
+        for digest, members in by_digest.items():
+            if len(members) < 2:
+                continue
+            kind = COPY if len({student_id for _, student_id, _ in members}) > 1 else RESUBMISSION
+            groups.append({'course': course_name, 'experiment': experiment_name, 'kind': kind,
+                           'label': KIND_LABELS[kind], 'digest': digest, 'size': size, 'files': sorted(members)})
+    groups.sort(key=lambda group: (group['course'], group['experiment'], -len(group['files'])))
+
+    for kind, label in KIND_LABELS.items():
+        count = sum(1 for group in groups if group['kind'] == kind)
+        if count:
+            logger.warning(f"{label}: {count} 组")
+    return groups
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, unquote, parse_qs
+
+from erat_core import Logger
+from erat_cli import add_common_arguments, setup_logging, create_parser
+
+
+REFRESH_INTERVAL = 1.0  # 把监视到的目录变化应用到解析结果的间隔（秒）
+IDLE_TIMEOUT = 30  # 保持连接时等待下一个请求的最长时间（秒）
+MAX_HEADER_LINES = 100
+RESPONSE_CACHE_SIZE = 256  # 最多缓存的响应条数，按最近使用淘汰
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               431: "Request Header Fields Too Large"}
+
+
+class NotFound(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class StatsServer:
+    # 在内存中保留一份解析结果，以 JSON 提供统计查询；所有请求和增量刷新都在同一个事件循环线程中执行，无需加锁
+    # 成功的响应按 (解析代数, 名单版本) 缓存，并带 ETag，客户端用 If-None-Match 重新验证时返回 304
+    def __init__(self, directory_parser, watcher=None, refresh_interval=REFRESH_INTERVAL):
+        self.directory_parser = directory_parser
+        self.watcher = watcher
+        self.refresh_interval = refresh_interval
+        self.logger = Logger()
+        self.cache = OrderedDict()  # 查询元组 -> (状态码, 响应体, ETag)，只含成功的响应
+        self.cache_key = None
+        self.request_count = 0
+
+    def current_key(self):
+        return self.directory_parser.generation, self.directory_parser.student_manager.version
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.logger.info(f"统计服务已启动: http://{host}:{port}/api/courses")
+        refresher = asyncio.create_task(self.refresh_loop()) if self.watcher else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if refresher:
+                refresher.cancel()
+
+    async def refresh_loop(self):
+        # refresh_paths 原地修改解析结果，因此在事件循环线程中同步执行，刷新期间的请求会等待；
+        # 单个实验目录的变化只需毫秒级，但课程或根目录级别的变化会重新扫描整门课程，期间所有读取都被阻塞
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            changes = self.watcher.take_changes()
+            if changes:
+                started = time.perf_counter()
+                refreshed = self.directory_parser.refresh_paths(changes)
+                if refreshed:
+                    self.logger.info(f"检测到目录变化，已更新 {len(refreshed)} 个班级，"
+                                     f"耗时 {time.perf_counter() - started:.3f} 秒")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    # 请求行超过流的长度上限，缓冲区中残留的数据无法再按请求解析，回复后关闭连接
+                    await self.send(writer, 400, self.error_body("请求行过长"), keep_alive=False)
+                    break
+                if not request_line:
+                    break
+
+                headers = {}
+                try:
+                    for _ in range(MAX_HEADER_LINES):
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                except (ValueError, asyncio.LimitOverrunError):
+                    await self.send(writer, 431, self.error_body("请求头过长"), keep_alive=False)
+                    break
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await self.send(writer, 400, self.error_body("请求格式错误"), keep_alive=False)
+                    break
+                method, target, version = parts
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and (version == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive'))
+
+                if method not in ('GET', 'HEAD'):
+                    await self.send(writer, 405, self.error_body("只支持 GET 请求"), keep_alive=keep_alive)
+                else:
+                    status, body, etag = self.respond(target)
+                    if etag and headers.get('if-none-match') == etag:
+                        await self.send(writer, 304, b'', etag=etag, keep_alive=keep_alive)
+                    else:
+                        await self.send(writer, status, body, etag=etag, keep_alive=keep_alive,
+                                        head_only=method == 'HEAD')
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, body, etag=None, keep_alive=True, head_only=False):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+                 "Content-Type: application/json; charset=utf-8",
+                 f"Content-Length: {len(body)}",
+                 "Cache-Control: no-cache",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if etag:
+            lines.append(f"ETag: {etag}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        if not head_only:
+            writer.write(body)
+        await writer.drain()
+
+    def respond(self, target):
+        # 返回 (状态码, 响应体, ETag)；同一份解析结果下同一查询只序列化一次
+        # 缓存键是规整后的查询本身而不是原始请求串，只缓存成功的响应，且条数有上限
+        self.request_count += 1
+        try:
+            query = self.resolve(target)
+        except NotFound as e:
+            return 404, self.error_body(str(e)), None
+        except BadRequest as e:
+            return 400, self.error_body(str(e)), None
+
+        key = self.current_key()
+        if self.cache_key != key:
+            self.cache.clear()
+            self.cache_key = key
+        cached = self.cache.get(query)
+        if cached is not None:
+            self.cache.move_to_end(query)
+            return cached
+
+        body = json.dumps(self.render(query), ensure_ascii=False).encode('utf-8')
+        response = (200, body, f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+        self.cache[query] = response
+        if len(self.cache) > RESPONSE_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return response
+
+    def resolve(self, target):
+        # 把请求路径规整为查询元组，只保留实际用到的参数；路径或参数无效时抛出 NotFound / BadRequest
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split('/') if part]
+        parser = self.directory_parser
+
+        if parts == ['api', 'status']:
+            return ('status',)
+        if parts == ['api', 'courses']:
+            return ('courses',)
+        if parts == ['api', 'summary']:
+            top = parse_qs(url.query).get('top', ['20'])[0]
+            if not top.isdigit():
+                raise BadRequest("top 必须是非负整数")
+            return ('summary', int(top))
+        if len(parts) >= 4 and parts[:2] == ['api', 'courses'] and parts[3] == 'classes':
+            course_name = parts[2]
+            if course_name not in parser.courses:
+                raise NotFound(f"课程不存在: {course_name}")
+            if len(parts) == 4:
+                return ('classes', course_name)
+            class_name = parts[4]
+            if class_name not in parser.courses[course_name].classes:
+                raise NotFound(f"班级不存在: {course_name}/{class_name}")
+            if len(parts) == 6 and parts[5] in ('students', 'experiments', 'rates'):
+                return (parts[5], course_name, class_name)
+        raise NotFound(f"未知路径: {url.path}")
+
+    def render(self, query):
+        parser = self.directory_parser
+        kind, args = query[0], query[1:]
+        if kind == 'status':
+            return {'root': parser.root_path, 'generation': parser.generation,
+                    'students': len(parser.student_manager.students), 'courses': len(parser.courses),
+                    'diagnostics': dict(parser.diagnostics.counts)}
+        if kind == 'courses':
+            return parser.get_course_names()
+        if kind == 'summary':
+            return parser.get_aggregate_stats(*args)
+        if kind == 'classes':
+            return parser.get_class_names(*args)
+        if kind == 'students':
+            return parser.get_student_stats(*args)
+        if kind == 'experiments':
+            return parser.get_experiment_stats(*args)
+        names, rates = parser.get_submission_rates(*args)
+        return {'names': names, 'rates': rates}
+
+    @staticmethod
+    def error_body(message):
+        return json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="实验报告统计服务：解析一次目录并持续增量刷新，以 HTTP/JSON 提供统计结果")
+    add_common_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认只接受本机连接")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口，默认 8765")
+    parser.add_argument("--no-watch", action="store_true", help="不监视目录变化，只提供启动时的解析结果")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    logger = setup_logging(args)
+    directory_parser = create_parser(args)
+    if directory_parser is None:
+        return 1
+    if not directory_parser.parse_directory(args.root):
+        return 1
+
+    watcher = None
+    if not args.no_watch:
+        from erat_watch import DirectoryWatcher
+
+        watcher = DirectoryWatcher(directory_parser.root_path)
+        watcher.start()
+
+    try:
+        asyncio.run(StatsServer(directory_parser, watcher).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.log("统计服务已停止")
+    finally:
+        if watcher is not None:
+            watcher.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import html
+import random
+import zipfile
+import zlib
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from erat_core import CACHE_DIR, Logger
+from erat_dedup import HashCache, hash_file
+
+
+SHINGLE_SIZE = 5  # 以连续 5 个字符为一个片段，对中文和英文都适用
+NUM_PERM = 128  # MinHash 签名长度
+BANDS = 16  # LSH 分段数，每段 NUM_PERM // BANDS 个值；相似度约 0.7 以上的文件大概率落入同一桶
+DEFAULT_THRESHOLD = 0.8  # 估计相似度达到该值才报告
+POOL_MIN_FILES = 16  # 需要提取文本的文件少于该数量时直接在本进程处理
+SIGNATURE_CACHE_VERSION = 2
+
+MERSENNE_PRIME = (1 << 61) - 1
+MASK32 = (1 << 32) - 1
+MASK64 = (1 << 64) - 1
+# 固定种子生成哈希参数，各进程、各次运行得到的签名可以互相比较和缓存
+_random = random.Random(20240901)
+PERM_A = [_random.randrange(1, MERSENNE_PRIME) for _ in range(NUM_PERM)]
+PERM_B = [_random.randrange(0, MERSENNE_PRIME) for _ in range(NUM_PERM)]
+
+NON_WORD = re.compile(r'\W+')
+DOCX_TEXT = re.compile(r'<w:t(?:\s[^>]*)?>([^<]*)</w:t>|</w:p>')
+
+
+def _read_text(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    for encoding in ('utf-8', 'gbk'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='ignore')
+
+
+def _read_docx(path):
+    # docx 是 zip 包，正文在 word/document.xml 的 <w:t> 元素中
+    with zipfile.ZipFile(path) as archive:
+        xml = archive.read('word/document.xml').decode('utf-8', errors='ignore')
+    return '\n'.join(html.unescape(text) for text in DOCX_TEXT.findall(xml))
+
+
+def _read_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+
+
+# 扩展名 -> 文本提取函数；旧版 .doc 是二进制格式，标准库无法可靠提取，不参与相似度检测
+EXTRACTORS = {'.txt': _read_text, '.md': _read_text, '.docx': _read_docx, '.pdf': _read_pdf}
+
+
+def extract_text(path):
+    extractor = EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        return None
+    try:
+        return extractor(path)
+    except Exception:
+        return None
+
+
+def shingle_hashes(text):
+    # 去掉空白和标点后取字符片段，用 crc32 得到跨进程稳定的 32 位哈希
+    text = NON_WORD.sub('', text).lower()
+    if len(text) < SHINGLE_SIZE:
+        return set()
+    return {zlib.crc32(text[i:i + SHINGLE_SIZE].encode('utf-8'))
+            for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(hashes):
+    # 有 numpy 时整体向量化计算；纯 Python 实现按同样的 64 位回绕规则计算，两者结果一致
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    if np is not None:
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        a = np.array(PERM_A, dtype=np.uint64)[:, None]
+        b = np.array(PERM_B, dtype=np.uint64)[:, None]
+        with np.errstate(over='ignore'):
+            permuted = (a * values + b) % np.uint64(MERSENNE_PRIME) & np.uint64(MASK32)
+        return array('I', permuted.min(axis=1).astype(np.uint32).tobytes())
+
+    return array('I', (min((((a * value + b) & MASK64) % MERSENNE_PRIME) & MASK32 for value in hashes)
+                       for a, b in zip(PERM_A, PERM_B)))
+
+
+def file_signature(path):
+    # 在子进程中执行：返回 (路径, 大小, mtime_ns, 内容摘要, 签名十六进制串)；
+    # 提取失败（缺少 pypdf、文件损坏等）时签名为 None，文本过短无法计算签名时为空串
+    path, size, mtime_ns, digest = hash_file(path)
+    if digest is None:
+        return path, size, mtime_ns, digest, None
+    text = extract_text(path)
+    if text is None:
+        return path, size, mtime_ns, digest, None
+    hashes = shingle_hashes(text)
+    signature = minhash(hashes).tobytes().hex() if hashes else ''
+    return path, size, mtime_ns, digest, signature
+
+
+def estimate_similarity(left, right):
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERM
+
+
+class SignatureCache:
+    # 内容摘要 -> 签名十六进制串（空串表示文本过短），内容相同的文件只计算一次；
+    # 提取失败的文件不写入缓存，下次运行时重新提取
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.entries = {}
+        self.path = os.path.join(cache_dir, "signatures.json") if cache_dir else None
+        if self.path:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == SIGNATURE_CACHE_VERSION and data.get('num_perm') == NUM_PERM:
+                    self.entries = data.get('signatures', {})
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                Logger().warning(f"读取签名缓存失败: {str(e)}")
+
+    def save(self, keep_digests):
+        # 只保留 keep_digests 中的摘要，避免缓存无限增长
+        if not self.path:
+            return
+        self.entries = {digest: signature for digest, signature in self.entries.items() if digest in keep_digests}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SIGNATURE_CACHE_VERSION, 'num_perm': NUM_PERM, 'signatures': self.entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            Logger().warning(f"保存签名缓存失败: {str(e)}")
+
+
+def find_similar(directory_parser, threshold=DEFAULT_THRESHOLD, max_workers=None, cache_dir=CACHE_DIR,
+                 progress_callback=None, cancel_event=None):
+    # 在同一课程的同一实验内（跨班级）查找内容高度相似的不同学生的提交，返回按相似度降序的文件对：
+    # {course, experiment, similarity, left: (班级名, 学号, 路径), right: (班级名, 学号, 路径)}
+    # 用 LSH 分段分桶，只比较至少有一段签名完全相同的文件，不做两两比较
+    logger = Logger()
+    hash_cache = HashCache(directory_parser.root_path, cache_dir)
+    signature_cache = SignatureCache(cache_dir)
+
+    files = []  # [(课程名, 实验名, 班级名, 学号, 路径)]
+    digests = {}  # 路径 -> 内容摘要
+    pending = []
+    matched_paths = set()
+    for course_name, class_name, experiment_name, student_id, path in directory_parser.iter_matched_files():
+        matched_paths.add(path)
+        if os.path.splitext(path)[1].lower() not in EXTRACTORS:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((course_name, experiment_name, class_name, student_id, path))
+        digest = hash_cache.get(path, stat.st_size, stat.st_mtime_ns)
+        if digest is not None and digest in signature_cache.entries:
+            digests[path] = digest
+        else:
+            pending.append(path)
+
+    if pending:
+        executor = None
+        if len(pending) < POOL_MIN_FILES or max_workers == 1:
+            results = map(file_signature, pending)
+        else:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+            results = executor.map(file_signature, pending, chunksize=4)
+        try:
+            for done, (path, size, mtime_ns, digest, signature) in enumerate(results, 1):
+                if digest is not None:
+                    digests[path] = digest
+                    hash_cache.put(path, size, mtime_ns, digest)
+                    if signature is not None:
+                        signature_cache.entries[digest] = signature
+                if progress_callback:
+                    progress_callback(done, len(pending), os.path.basename(path))
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.log("相似度检测已取消")
+                    return []
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    hash_cache.save(matched_paths)
+    signature_cache.save(set(digests.values()))
+
+    experiments = defaultdict(list)  # (课程名, 实验名) -> [(班级名, 学号, 路径, 签名)]
+    skipped = 0
+    for course_name, experiment_name, class_name, student_id, path in files:
+        signature = signature_cache.entries.get(digests.get(path))
+        if not signature:
+            skipped += 1
+            continue
+        experiments[(course_name, experiment_name)].append(
+            (class_name, student_id, path, array('I', bytes.fromhex(signature))))
+
+    rows = NUM_PERM // BANDS
+    pairs = []
+    compared = 0
+    for (course_name, experiment_name), members in experiments.items():
+        buckets = defaultdict(list)
+        for index, (_, _, _, signature) in enumerate(members):
+            for band in range(BANDS):
+                buckets[(band, signature[band * rows:(band + 1) * rows].tobytes())].append(index)
+
+        candidates = set()
+        for indexes in buckets.values():
+            for i, left in enumerate(indexes):
+                for right in indexes[i + 1:]:
+                    candidates.add((left, right))
+
+        for left, right in candidates:
+            left_file, right_file = members[left], members[right]
+            if left_file[1] == right_file[1]:
+                continue  # 同一学生的多个文件不算抄袭
+            compared += 1
+            similarity = estimate_similarity(left_file[3], right_file[3])
+            if similarity >= threshold:
+                pairs.append({'course': course_name, 'experiment': experiment_name, 'similarity': similarity,
+                              'left': left_file[:3], 'right': right_file[:3]})
+
+    pairs.sort(key=lambda pair: (-pair['similarity'], pair['course'], pair['experiment'], pair['left']))
+    logger.info(f"相似度检测: {len(files)} 个文件（{len(pending)} 个重新提取，{skipped} 个无法提取文本），"
+                f"比较 {compared} 对候选")
+    if pairs:
+        logger.warning(f"内容高度相似: {len(pairs)} 对文件（阈值 {threshold:.0%}）")
+    return pairs
@@ -0,0 +1,220 @@
+import os
+import time
+import sqlite3
+from array import array
+from collections import defaultdict
+
+from erat_core import CACHE_DIR, STUDENT_IDS, DirectoryParser, Logger
+
+
+STORE_PATH = os.path.join(CACHE_DIR, "erat.db")
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS students (
+    student_id TEXT PRIMARY KEY, name TEXT, grade TEXT, class_name TEXT, position INTEGER);
+CREATE INDEX IF NOT EXISTS students_class ON students (class_name, position);
+CREATE TABLE IF NOT EXISTS courses (name TEXT PRIMARY KEY, position INTEGER);
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY, course TEXT, name TEXT, position INTEGER, UNIQUE (course, name));
+CREATE TABLE IF NOT EXISTS experiments (
+    id INTEGER PRIMARY KEY, class_id INTEGER, name TEXT, position INTEGER, UNIQUE (class_id, name));
+CREATE INDEX IF NOT EXISTS experiments_class ON experiments (class_id, position);
+CREATE TABLE IF NOT EXISTS submissions (
+    experiment_id INTEGER, student_id TEXT, PRIMARY KEY (experiment_id, student_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS submissions_student ON submissions (student_id);
+"""
+
+# 班级名单中未提交某实验的学生，按实验顺序、名单顺序排列
+MISSING_QUERY = """
+SELECT e.name, st.student_id, st.name
+FROM classes c
+JOIN experiments e ON e.class_id = c.id
+JOIN students st ON st.class_name = c.name
+WHERE c.course = ? AND c.name = ?
+  AND NOT EXISTS (SELECT 1 FROM submissions s WHERE s.experiment_id = e.id AND s.student_id = st.student_id)
+ORDER BY {order}
+"""
+
+SUBMITTED_QUERY = """
+SELECT e.name, (SELECT COUNT(*) FROM submissions s WHERE s.experiment_id = e.id)
+FROM classes c JOIN experiments e ON e.class_id = c.id
+WHERE c.course = ? AND c.name = ?
+ORDER BY e.position
+"""
+
+
+class SubmissionStore:
+    # SQLite 持久化的名单和最近一次扫描结果（WAL 模式）。挂到 DirectoryParser.store 上后：
+    # 每次解析/增量刷新结束时写入变化的部分；内容与内存一致时统计改由带索引的 SQL 查询得到；
+    # 下次启动可以直接 load，无需重新导入名单和遍历目录
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        if self._get_meta('schema_version') not in (None, str(SCHEMA_VERSION)):
+            raise sqlite3.DatabaseError(f"不支持的数据库版本: {self._get_meta('schema_version')}")
+        self.synced_key = None  # 与数据库内容一致的 (解析代数, 名单版本)
+        self.roster_version = None  # 已写入的名单版本
+
+    def close(self):
+        self.connection.close()
+
+    def _get_meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def has_data(self):
+        return self._get_meta('root_path') is not None
+
+    def is_current(self, directory_parser):
+        return self.synced_key == (directory_parser.generation, directory_parser.student_manager.version)
+
+    def save(self, directory_parser, class_keys=None):
+        # class_keys 为 [(课程名, 班级名)] 时只重写这些班级，否则重写全部扫描结果；名单有变化时一并重写
+        started = time.perf_counter()
+        student_manager = directory_parser.student_manager
+        with self.connection:
+            if self.roster_version != student_manager.version:
+                self._write_students(student_manager)
+            if class_keys is None:
+                self.connection.execute("DELETE FROM submissions")
+                self.connection.execute("DELETE FROM experiments")
+                self.connection.execute("DELETE FROM classes")
+                class_keys = [(course.name, class_name)
+                              for course in directory_parser.courses.values() for class_name in course.classes]
+            self._write_courses(directory_parser)
+            for course_name, class_name in class_keys:
+                self._write_class(directory_parser, course_name, class_name)
+            self.connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ('schema_version', str(SCHEMA_VERSION)),
+                ('root_path', directory_parser.root_path),
+                ('saved_at', time.strftime('%Y-%m-%d %H:%M:%S')),
+            ])
+        self.roster_version = student_manager.version
+        self.synced_key = (directory_parser.generation, student_manager.version)
+        Logger().debug(f"写入数据库 {len(class_keys)} 个班级，耗时 {time.perf_counter() - started:.3f} 秒")
+
+    def _write_students(self, student_manager):
+        self.connection.execute("DELETE FROM students")
+        self.connection.executemany(
+            "INSERT INTO students VALUES (?, ?, ?, ?, ?)",
+            ((student.student_id, student.name, student.grade, student.class_name, position)
+             for position, student in enumerate(student_manager.get_all_students())))
+
+    def _write_courses(self, directory_parser):
+        self.connection.execute("DELETE FROM courses")
+        self.connection.executemany("INSERT INTO courses VALUES (?, ?)",
+                                    ((name, position) for position, name in enumerate(directory_parser.courses)))
+        # 班级顺序按课程内的目录顺序重新编号
+        self.connection.executemany(
+            "UPDATE classes SET position = ? WHERE course = ? AND name = ?",
+            ((position, course.name, class_name) for course in directory_parser.courses.values()
+             for position, class_name in enumerate(course.classes)))
+
+    def _write_class(self, directory_parser, course_name, class_name):
+        row = self.connection.execute("SELECT id FROM classes WHERE course = ? AND name = ?",
+                                      (course_name, class_name)).fetchone()
+        if row:
+            self.connection.execute(
+                "DELETE FROM submissions WHERE experiment_id IN (SELECT id FROM experiments WHERE class_id = ?)", row)
+            self.connection.execute("DELETE FROM experiments WHERE class_id = ?", row)
+            self.connection.execute("DELETE FROM classes WHERE id = ?", row)
+
+        course = directory_parser.courses.get(course_name)
+        class_obj = course.get_class(class_name) if course else None
+        if class_obj is None:
+            return
+        position = list(course.classes).index(class_name)
+        class_id = self.connection.execute("INSERT INTO classes (course, name, position) VALUES (?, ?, ?)",
+                                           (course_name, class_name, position)).lastrowid
+        for position, experiment in enumerate(class_obj.experiments.values()):
+            experiment_id = self.connection.execute(
+                "INSERT INTO experiments (class_id, name, position) VALUES (?, ?, ?)",
+                (class_id, experiment.name, position)).lastrowid
+            self.connection.executemany("INSERT INTO submissions VALUES (?, ?)",
+                                        ((experiment_id, STUDENT_IDS.student_id(ordinal))
+                                         for ordinal in experiment.submitted_ordinals))
+
+    def load(self, directory_parser):
+        # 用数据库中的名单和扫描结果替换内存中的状态，返回是否加载成功
+        root_path = self._get_meta('root_path')
+        if root_path is None:
+            return False
+        started = time.perf_counter()
+        student_manager = directory_parser.student_manager
+        student_manager.clear_students()
+        student_manager.add_students(self.connection.execute(
+            "SELECT student_id, name, grade, class_name FROM students ORDER BY position"))
+
+        submitted = defaultdict(list)  # 实验 id -> [学号序号]
+        for experiment_id, student_id in self.connection.execute("SELECT experiment_id, student_id FROM submissions"):
+            submitted[experiment_id].append(STUDENT_IDS.ordinal(student_id))
+
+        directory_parser.courses = {}
+        directory_parser.missing_index = {}
+        directory_parser.diagnostics.clear()
+        for (course_name,) in self.connection.execute("SELECT name FROM courses ORDER BY position"):
+            directory_parser.add_course(course_name)
+        classes = {}  # 班级 id -> Class
+        for class_id, course_name, class_name in self.connection.execute(
+                "SELECT id, course, name FROM classes ORDER BY course, position"):
+            classes[class_id] = directory_parser.add_course(course_name).add_class(class_name)
+        for experiment_id, class_id, name in self.connection.execute(
+                "SELECT id, class_id, name FROM experiments ORDER BY class_id, position"):
+            experiment = classes[class_id].add_experiment(name)
+            experiment.submitted_ordinals = array('I', sorted(set(submitted[experiment_id])))
+
+        directory_parser.root_path = root_path
+        directory_parser.scan_manifest = directory_parser._load_manifest(root_path)
+        for student in student_manager.get_all_students():
+            student.missing_experiments = []
+        for course in directory_parser.courses.values():
+            directory_parser._update_missing_experiments(course)
+        directory_parser.generation += 1
+
+        self.roster_version = student_manager.version
+        self.synced_key = (directory_parser.generation, student_manager.version)
+        Logger().info(f"已从数据库加载 {len(student_manager.students)} 名学生、{len(classes)} 个班级"
+                      f"（保存于 {self._get_meta('saved_at')}），耗时 {time.perf_counter() - started:.3f} 秒")
+        return True
+
+    def student_stats(self, course_name, class_name):
+        students = self.connection.execute(
+            "SELECT student_id, name, grade, class_name FROM students st WHERE class_name = ? "
+            "AND EXISTS (SELECT 1 FROM classes c WHERE c.course = ? AND c.name = st.class_name) ORDER BY position",
+            (class_name, course_name)).fetchall()
+        missing = defaultdict(list)
+        for experiment_name, student_id, _ in self.connection.execute(
+                MISSING_QUERY.format(order="st.position, e.position"), (course_name, class_name)):
+            missing[student_id].append(experiment_name)
+        return [{'student_id': student_id, 'name': name, 'grade': grade, 'class_name': student_class,
+                 'missing_count': len(missing[student_id]), 'missing_list': ", ".join(missing[student_id])}
+                for student_id, name, grade, student_class in students]
+
+    def experiment_stats(self, course_name, class_name):
+        total = self._roster_size(class_name)
+        missing = defaultdict(list)
+        for experiment_name, student_id, name in self.connection.execute(
+                MISSING_QUERY.format(order="e.position, st.position"), (course_name, class_name)):
+            missing[experiment_name].append(f"{name}({student_id})")
+        return [{'experiment_name': experiment_name,
+                 'submission_rate': submitted / total * 100 if total else 0,
+                 'missing_students': ", ".join(missing[experiment_name])}
+                for experiment_name, submitted in self.connection.execute(SUBMITTED_QUERY, (course_name, class_name))]
+
+    def submission_rates(self, course_name, class_name):
+        total = self._roster_size(class_name)
+        rows = sorted(self.connection.execute(SUBMITTED_QUERY, (course_name, class_name)).fetchall(),
+                      key=lambda row: DirectoryParser._experiment_number(row[0]) or 0)
+        return [name for name, _ in rows], [submitted / total * 100 if total else 0 for _, submitted in rows]
+
+    def _roster_size(self, class_name):
+        return self.connection.execute("SELECT COUNT(*) FROM students WHERE class_name = ?",
+                                       (class_name,)).fetchone()[0]
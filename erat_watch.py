@@ -0,0 +1,92 @@
+import os
+import threading
+
+from erat_core import Logger
+
+
+POLL_INTERVAL = 0.4  # 轮询模式下两次检查之间的间隔（秒），加上界面 500 毫秒的应用间隔，变化在 1 秒内显示
+WATCH_EVENTS = ('created', 'deleted', 'moved')  # 会改变提交情况的事件，文件内容修改不影响统计
+
+
+class DirectoryWatcher:
+    # 监视实验报告根目录，收集发生变化的路径，由调用方定期取走后交给 DirectoryParser.refresh_paths
+    # 安装了 watchdog 时使用系统通知（Linux 上为 inotify），否则每隔 poll_interval 秒比较各级目录的 mtime
+    def __init__(self, root_path, poll_interval=POLL_INTERVAL):
+        self.root_path = os.path.abspath(root_path)
+        self.poll_interval = poll_interval
+        self.backend = None  # 'watchdog' 或 'polling'
+        self.changes = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.observer = None
+        self.poll_thread = None
+
+    def start(self):
+        try:
+            from watchdog.observers import Observer
+        except ImportError:
+            Observer = None
+
+        if Observer is not None:
+            self.observer = Observer()
+            # Observer 只调用处理器的 dispatch(event)，不需要继承 watchdog 的处理器类
+            self.observer.schedule(self, self.root_path, recursive=True)
+            self.observer.daemon = True
+            self.observer.start()
+            self.backend = 'watchdog'
+        else:
+            self.snapshot = self._snapshot()
+            self.poll_thread = threading.Thread(target=self._poll_loop, daemon=True)
+            self.poll_thread.start()
+            self.backend = 'polling'
+        Logger().info(f"开始监视目录（{self.backend}）: {self.root_path}")
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        if self.poll_thread is not None:
+            self.stop_event.set()
+            self.poll_thread.join()
+            self.poll_thread = None
+        Logger().info(f"停止监视目录: {self.root_path}")
+
+    def take_changes(self):
+        # 取走并清空目前收集到的变化路径
+        with self.lock:
+            changes, self.changes = self.changes, set()
+        return changes
+
+    def dispatch(self, event):
+        if event.event_type not in WATCH_EVENTS:
+            return
+        with self.lock:
+            self.changes.add(event.src_path)
+            if event.event_type == 'moved':
+                self.changes.add(event.dest_path)
+
+    def _snapshot(self):
+        # 根目录及 课程/班级/实验 三级目录的 mtime；目录内增删、重命名文件都会改变该目录的 mtime
+        snapshot = {}
+        pending = [(self.root_path, 0)]
+        while pending:
+            path, depth = pending.pop()
+            try:
+                snapshot[path] = os.stat(path).st_mtime_ns
+                if depth < 3:
+                    with os.scandir(path) as entries:
+                        pending.extend((entry.path, depth + 1) for entry in entries if entry.is_dir())
+            except OSError:
+                continue
+        return snapshot
+
+    def _poll_loop(self):
+        while not self.stop_event.wait(self.poll_interval):
+            snapshot = self._snapshot()
+            changed = {path for path, mtime_ns in snapshot.items() if self.snapshot.get(path) != mtime_ns}
+            changed.update(path for path in self.snapshot if path not in snapshot)
+            self.snapshot = snapshot
+            if changed:
+                with self.lock:
+                    self.changes.update(changed)